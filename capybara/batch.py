@@ -0,0 +1,182 @@
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from capybara.eucalypt import nexparser
+from capybara.eucalypt.util import format_count
+from capybara.interface import DataInterface
+
+try:
+    import resource
+except ImportError:  # not on Windows, the memory peaks are left empty
+    resource = None
+
+
+FIELDS = ('job', 'file', 'problem', 'task', 'cost_vector', 'optimal_cost', 'answer', 'status', 'message',
+          'seconds', 'memory_kb')
+
+
+class JobTimeout(Exception):
+    pass
+
+
+def find_inputs(inputs):
+    """
+    The Nexus files given by a directory (its .nex files), a glob pattern or a file name, or a list of them
+    """
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    names = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            names.update(glob.glob(os.path.join(pattern, '*.nex')))
+        elif glob.has_magic(pattern):
+            names.update(glob.glob(pattern))
+        else:
+            names.add(pattern)  # a missing file is reported as a failed job
+    return sorted(os.path.abspath(name) for name in names)
+
+
+def raise_timeout(sig, frame):
+    raise JobTimeout
+
+
+def memory_peak():
+    """Peak resident memory of the current process in kB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_job(job):
+    """
+    Count the solutions (or classes) of every problem of one file for one task and one cost vector
+
+    The job runs in a fresh worker process, the timeout covers all the problems of the file
+    and is only enforced where SIGALRM exists
+    """
+    index, input_name, task, cost_vector, threshold, approximate, timeout = job
+    rows = []
+
+    def add_row(start, status, message='', optimal_cost=None, answer=None):
+        rows.append({'job': index, 'file': input_name, 'problem': len(rows), 'task': task,
+                     'cost_vector': ' '.join(f'{cost:g}' for cost in cost_vector), 'optimal_cost': optimal_cost, 'answer': answer,
+                     'status': status, 'message': message, 'seconds': round(time.perf_counter() - start, 6)})
+
+    use_alarm = timeout is not None and hasattr(signal, 'SIGALRM')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    start = time.perf_counter()
+    try:
+        with open(input_name, 'r') as file:
+            for parasite_tree, host_tree, leaf_map in nexparser.NexusParser(file).problems():
+                data = DataInterface(parasite_tree, host_tree, leaf_map, threshold)
+                if task == 1:
+                    opt_cost, answer = data.count_optimal_solutions(cost_vector, approximate)
+                else:
+                    opt_cost, root = data.count_solutions(cost_vector, task - 1, cli=True,
+                                                          approximate=approximate and task != 2)
+                    answer = len(root.event_vectors) if task == 2 else root.num_subsolutions
+                add_row(start, 'ok', optimal_cost=opt_cost, answer=answer)
+                start = time.perf_counter()
+    except JobTimeout:
+        add_row(start, 'timeout', f'Timed out after {timeout} s.')
+    except nexparser.NexusFileParserException as e:
+        add_row(start, 'error', e.message)
+    except Exception as e:  # one failed file does not stop the batch
+        add_row(start, 'error', f'{type(e).__name__}: {e}')
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    peak = memory_peak()
+    for row in rows:
+        row['memory_kb'] = peak
+    return rows
+
+
+def check_options(tasks, cost_vectors, workers, timeout, output_format):
+    if not tasks or any(task not in (1, 2, 3, 4) for task in tasks):
+        raise ValueError('The tasks are not valid.')
+    if not cost_vectors or any(len(cost_vector) != 4 for cost_vector in cost_vectors):
+        raise ValueError('The cost vectors are not valid.')
+    if workers < 1:
+        raise ValueError('The number of processes is not valid.')
+    if timeout is not None and timeout <= 0:
+        raise ValueError('The timeout is not valid.')
+    if output_format not in ('csv', 'jsonl'):
+        raise ValueError('The output format should be csv or jsonl.')
+
+
+def run(inputs, output_name, tasks=(1,), cost_vectors=((-1, 1, 1, 1),), threshold=float('Inf'), processes=None,
+        timeout=None, approximate=False, output_format=None):
+    """
+    Run the Counter tasks with the cost vectors on every Nexus file over a process pool,
+    write one row per file, problem, task and cost vector to a CSV or JSON Lines file
+
+    The output format follows the extension of the output file unless given, the rows are written as the jobs finish.
+    Return the number of rows of each status
+    """
+    processes = processes or os.cpu_count() or 1
+    cost_vectors = [tuple(map(float, cost_vector)) for cost_vector in cost_vectors]
+    if output_format is None:
+        output_format = 'jsonl' if output_name.endswith(('.jsonl', '.json')) else 'csv'
+    check_options(tasks, cost_vectors, processes, timeout, output_format)
+
+    jobs = []
+    for input_name in find_inputs(inputs):
+        for task in tasks:
+            for cost_vector in cost_vectors:
+                jobs.append((len(jobs), input_name, task, cost_vector, threshold, approximate, timeout))
+
+    summary = {}
+    with open(output_name, 'w', newline='') as file:
+        writer = None
+        if output_format == 'csv':
+            writer = csv.DictWriter(file, FIELDS)
+            writer.writeheader()
+        # a fresh process per job gives its own memory peak and drops what a failed job leaves behind
+        with multiprocessing.Pool(min(processes, max(len(jobs), 1)), maxtasksperchild=1) as pool:
+            for rows in pool.imap_unordered(run_job, jobs):
+                for row in rows:
+                    summary[row['status']] = summary.get(row['status'], 0) + 1
+                    if writer is not None:
+                        writer.writerow(dict(row, answer=None if row['answer'] is None
+                                             else format_count(row['answer'])))
+                    else:
+                        file.write(json.dumps(row) + '\n')
+                file.flush()
+    return summary
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(prog='python -m capybara.batch',
+                                     description='Run Capybara Counter tasks on many Nexus files.')
+    parser.add_argument('inputs', nargs='+', help='Nexus files, directories or glob patterns')
+    parser.add_argument('-o', '--output', required=True, help='output table (.csv or .jsonl)')
+    parser.add_argument('-t', '--tasks', nargs='+', type=int, default=[1], help='Counter tasks, from 1 to 4')
+    parser.add_argument('-c', '--cost-vector', nargs=4, type=float, action='append', dest='cost_vectors',
+                        metavar=('COSPECIATION', 'DUPLICATION', 'SWITCH', 'LOSS'),
+                        help='cost vector, can be repeated (default: -1 1 1 1)')
+    parser.add_argument('-d', '--threshold', type=int, default=float('Inf'), help='host-switch distance threshold')
+    parser.add_argument('-p', '--processes', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--timeout', type=float, default=None, help='time limit of each job in seconds')
+    parser.add_argument('--approximate', action='store_true', help='approximate numbers of solutions and of classes as floats')
+    options = parser.parse_args(arguments)
+    try:
+        summary = run(options.inputs, options.output, options.tasks, options.cost_vectors or [(-1, 1, 1, 1)],
+                      options.threshold, options.processes, options.timeout, options.approximate)
+    except ValueError as e:
+        parser.error(str(e))
+    print(', '.join(f'{status}: {count}' for status, count in sorted(summary.items())) or 'No input file.')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,8 @@
 from capybara.worker import Counter
 
 
-def run(input_name, task, cost_vector=(-1, 1, 1, 1), verbose=False):
-    counter = Counter(input_name, task, cost_vector, verbose)
+def run(input_name, task, cost_vector=(-1, 1, 1, 1), verbose=False, threshold=float('Inf'), processes=1,
+        approximate=False):
+    counter = Counter(input_name, task, cost_vector, verbose, threshold, processes, approximate)
     return counter.run()
 
@@ -2,8 +2,9 @@ from capybara.worker import Enumerator
 
 
 def run(input_name, output_name, task, cost_vector=(-1, 1, 1, 1),
-        verbose=False, maximum=float('Inf'), acyclic_only=False):
+        verbose=False, maximum=float('Inf'), acyclic_only=False, threshold=float('Inf'),
+        processes=1, delta=0):
     enumerator = Enumerator(input_name, output_name, task, cost_vector,
-                            verbose, maximum, acyclic_only)
+                            verbose, maximum, acyclic_only, threshold, processes, delta)
     return enumerator.run()
 
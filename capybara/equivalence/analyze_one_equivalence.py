@@ -39,7 +39,7 @@ class EventEnumerator:
                                            self.cost_vector[1] * self.data.multiplier,
                                            self.cost_vector[2] * self.data.multiplier,
                                            self.cost_vector[3] * self.data.multiplier,
-                                           float('Inf'), self.task,
+                                           self.data.threshold, self.task,
                                            self.mapping, self.events, accumulate=True)
         self.new_root = reconciliator.run()
 
@@ -1,52 +1,52 @@
 from capybara.eucalypt.util import flatten, get_associations
+from capybara.eucalypt.sparse import sparse_matrix
 from capybara.eucalypt.solution import Association, NestedSolution
 from capybara.equivalence.equivalence_class import NestedClass
 
 
 def fill_reachable_matrix(parasite_tree, host_tree, optimal_solutions):
     """
-    Index all solutions for future access
+    Index all solutions for future access, each row maps a host index to its set of reachable nodes
     """
-    reachable = [[set() for _ in range(host_tree.size())] for _ in range(parasite_tree.size())]
+    reachable = [{} for _ in range(parasite_tree.size())]
 
     for root in flatten(optimal_solutions):
         association = root.association
-        reachable[association.parasite.index][association.host.index].add(root)
+        reachable[association.parasite.index].setdefault(association.host.index, set()).add(root)
 
-    def fill(p):
+    for p in reversed(parasite_tree.nodes):  # reversed post-order, each row is complete before its children
         if p.is_leaf():
-            return
+            continue
 
         p1, p2 = p.left_child, p.right_child
 
-        for h_index in range(host_tree.size()):
+        for h_index in sorted(reachable[p.index]):
             for node in reachable[p.index][h_index]:
                 for left_child in flatten(node.children[0]):
-                    reachable[p1.index][left_child.association.host.index].add(left_child)
+                    reachable[p1.index].setdefault(left_child.association.host.index, set()).add(left_child)
                 for right_child in flatten(node.children[1]):
-                    reachable[p2.index][right_child.association.host.index].add(right_child)
-        fill(p1)
-        fill(p2)
-
-    fill(parasite_tree.root)
+                    reachable[p2.index].setdefault(right_child.association.host.index, set()).add(right_child)
     return reachable
 
 
-def fill_class_matrix(parasite_tree, host_tree, leaf_map, reachable_matrix, task):
+def fill_class_matrix(parasite_tree, host_tree, leaf_map, reachable_matrix, task, approximate=False):
     """
-    Build the class enumeration graph by merging
+    Build the class enumeration graph by merging, the numbers of classes are floats with approximate
     """
     signature_func = get_sub_solution_event_partition if task == 2 else get_sub_solution_strong
-    class_matrix = [[NestedClass.empty_class() for _ in range(host_tree.size())] for _ in range(parasite_tree.size())]
+    class_matrix = sparse_matrix(parasite_tree.size(), host_tree.size(), NestedClass.empty_class())
     for p in parasite_tree:
         if p.is_leaf():
-            class_matrix[p.index][leaf_map[p].index] = NestedClass.class_from_leaf(p, leaf_map[p])
+            leaf_class = NestedClass.class_from_leaf(p, leaf_map[p])
+            if approximate:
+                leaf_class.num_subsolutions = 1.0
+            class_matrix[p.index][leaf_map[p].index] = leaf_class
 
         else:
             p1, p2 = p.left_child, p.right_child
 
-            for h in host_tree:
-                for node in reachable_matrix[p.index][h.index]:
+            for h_index, nodes in sorted(reachable_matrix[p.index].items()):
+                for node in nodes:
 
                     left_sum = NestedClass.empty_class()
                     for left_association in get_associations(node.children[0]):
@@ -59,11 +59,11 @@ def fill_class_matrix(parasite_tree, host_tree, leaf_map, reachable_matrix, task
                     # relabel the association and the event according to the equivalence relation
                     sub_sol = signature_func(left_sum, right_sum, node, p)
 
-                    class_matrix[p.index][h.index] = NestedClass.merge(class_matrix[p.index][h.index], sub_sol)
+                    class_matrix[p.index][h_index] = NestedClass.merge(class_matrix[p.index][h_index], sub_sol)
 
     root_sol = NestedClass.empty_class()
-    for h in host_tree:
-        root_sol = NestedClass.merge(root_sol, class_matrix[parasite_tree.root.index][h.index])
+    for _, solution in class_matrix[parasite_tree.root.index].items():
+        root_sol = NestedClass.merge(root_sol, solution)
     return root_sol
 
 
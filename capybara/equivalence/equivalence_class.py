@@ -4,8 +4,10 @@ from capybara.eucalypt.solution import Association, NestedSolution
 
 
 class NestedClass(NestedSolution):
+    __slots__ = ()
     GENERAL_NODE = TreeNode('GENERAL')
     SWITCH_NODE = TreeNode('SWITCH')
+    GENERAL_NODE.index, SWITCH_NODE.index = -1, -2  # distinct from each other and from the host indices
 
     def __init__(self, association, composition_type, event, children):
         super().__init__(0, association, composition_type, event, True, children)
@@ -75,19 +77,40 @@ class NestedClassWrapper:
         return hash(self) == hash(other)
 
     def __hash__(self):
-        # not a perfect hash
+        # not a perfect hash, computed children first with an explicit stack
         if self._hash is not None:
             return self._hash
-        if self.solution.composition_type == NestedSolution.MULTIPLE:
-            raise NotImplementedError
-        h = hash(repr(self.solution.association) + repr(self.solution.event))
-        if self.solution.children:
-            for c in self.left():
-                h ^= hash(c) >> 1
-            for c in self.right():
-                h ^= hash(c) << 1
-        self._hash = h
-        return h
+        pending = {}  # the unsorted children of the wrappers waiting for their children
+        stack = [self]
+        while stack:
+            wrapper = stack[-1]
+            if wrapper._hash is not None:
+                stack.pop()
+                continue
+            solution = wrapper.solution
+            if solution.composition_type == NestedSolution.MULTIPLE:
+                raise NotImplementedError
+            if solution.children and id(wrapper) not in pending:
+                left = wrapper._left or [NestedClassWrapper(c) for c in flatten(solution.children[0])]
+                right = wrapper._right or [NestedClassWrapper(c) for c in flatten(solution.children[1])]
+                pending[id(wrapper)] = left, right
+                stack.extend(c for c in left + right if c._hash is None)
+                continue
+
+            stack.pop()
+            association = solution.association
+            h = hash((None if association is None else association.key, solution.event))
+            if solution.children:
+                left, right = pending.pop(id(wrapper))
+                left.sort(key=lambda x: hash(x))
+                right.sort(key=lambda x: hash(x))
+                wrapper._left, wrapper._right = left, right
+                for c in left:
+                    h ^= hash(c) >> 1
+                for c in right:
+                    h ^= hash(c) << 1
+            wrapper._hash = h
+        return self._hash
 
     def __lt__(self, other):
         return hash(self) < hash(other)
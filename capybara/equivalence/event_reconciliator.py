@@ -7,6 +7,8 @@ class EventReconciliator(ReconciliatorEnumerator):
     """
     Recover optimal solutions knowing all events or all events and non-host-switch hosts
     """
+    cost_first = False  # the events are forced, so the unconstrained optimal costs do not apply
+
     def __init__(self, host_tree, parasite_tree, leaf_map,
                  cospeciation_cost, duplication_cost, transfer_cost, loss_cost, distance_threshold, task,
                  mapping, events, accumulate=False):
@@ -5,6 +5,8 @@ class EventVector:
     """
     A tuple of four integers which can also count the number of subsolutions
     """
+    __slots__ = 'vector', 'num_subsolutions'
+
     def __init__(self, vector, num_subsolutions=1):
         self.vector = vector
         self.num_subsolutions = num_subsolutions
@@ -39,11 +41,18 @@ class EventVector:
         new_vector[3] += 1
         return EventVector(new_vector, self.num_subsolutions)
 
+    def remove_losses(self, num_losses):
+        new_vector = self.vector[:]
+        new_vector[3] -= num_losses
+        return EventVector(new_vector, self.num_subsolutions)
+
 
 class NestedSolutionEventVector(NestedSolution):
     """
     NestedSolution that also remembers a set of event vectors
     """
+    __slots__ = 'event_vectors', 'num_losses'
+
     def __init__(self, cost, association, composition_type, event, accumulate, children,
                  event_vectors, num_losses=0):
         super().__init__(cost, association, composition_type, event, accumulate, children)
@@ -78,40 +87,34 @@ class SolutionGeneratorEventVector(SolutionGenerator):
         new_vectors = SolutionGeneratorEventVector.cartesian_event_vector(first.event_vectors,
                                                                           second.event_vectors, event, num_losses)
         return NestedSolutionEventVector(cost, association, NestedSolution.SIMPLE, event,
-                                         self.accumulate, [first, second], new_vectors, num_losses)
+                                         self.accumulate, (first, second), new_vectors, num_losses)
 
     def add_loss(self, loss_cost, solution):
-        new_event_vectors = set()
-        for event_vector in solution.event_vectors:
-            new_event_vectors.add(event_vector.add_loss())
-
-        if solution.composition_type == NestedSolution.MULTIPLE:
-            new_children = []
-            for child in solution.children:
-                new_child_event_vectors = set()
-                for child_event_vector in child.event_vectors:
-                    new_child_event_vectors.add(child_event_vector.add_loss())
-                new_child = NestedSolutionEventVector(solution.cost + loss_cost, child.association,
-                                                      child.composition_type, child.event, self.accumulate,
-                                                      child.children, new_child_event_vectors, child.num_losses+1)
-                new_children.append(new_child)
-            return NestedSolutionEventVector(solution.cost + loss_cost, solution.association,
-                                             solution.composition_type, solution.event, self.accumulate,
-                                             new_children, new_event_vectors)
-        else:
-            return NestedSolutionEventVector(solution.cost + loss_cost, solution.association,
-                                             solution.composition_type, solution.event, self.accumulate,
-                                             solution.children, new_event_vectors, solution.num_losses+1)
+        """
+        The children are shared, num_losses tells how many losses separate the node from its children
+        """
+        new_event_vectors = {event_vector.add_loss() for event_vector in solution.event_vectors}
+        return NestedSolutionEventVector(solution.cost + loss_cost, solution.association,
+                                         solution.composition_type, solution.event, self.accumulate,
+                                         solution.children, new_event_vectors, solution.num_losses+1)
 
-    def merge(self, first, second):
-        if first.cost == float('Inf'):
-            return self.empty_solution()
+    @staticmethod
+    def merged_children(first, second):
+        """
+        The children of a merged node, a merged node with losses above its children is kept as one child
+        """
         children = []
         for solution in [first, second]:
-            if solution.composition_type == NestedSolution.MULTIPLE:
+            if solution.composition_type == NestedSolution.MULTIPLE and not solution.num_losses:
                 children.extend(solution.children)
             else:
                 children.append(solution)
+        return children
+
+    def merge(self, first, second):
+        if first.cost == float('Inf'):
+            return self.empty_solution()
+        children = self.merged_children(first, second)
 
         new_event_vectors = {EventVector(v.vector, v.num_subsolutions) for v in first.event_vectors}
         new_event_vectors.update(second.event_vectors)
@@ -145,17 +148,12 @@ class SolutionGeneratorEventVectorCounter(SolutionGeneratorEventVector):
         new_vectors = SolutionGeneratorEventVectorCounter.cartesian_event_vector(first.event_vectors,
                                                                           second.event_vectors, event, num_losses)
         return NestedSolutionEventVector(cost, association, NestedSolution.SIMPLE, event,
-                                         self.accumulate, [first, second], new_vectors, num_losses)
+                                         self.accumulate, (first, second), new_vectors, num_losses)
 
     def merge(self, first, second):
         if first.cost == float('Inf'):
             return self.empty_solution()
-        children = []
-        for solution in [first, second]:
-            if solution.composition_type == NestedSolution.MULTIPLE:
-                children.extend(solution.children)
-            else:
-                children.append(solution)
+        children = self.merged_children(first, second)
 
         new_event_vectors = {EventVector(v.vector, v.num_subsolutions) for v in first.event_vectors}
         count = {vec: vec.num_subsolutions for vec in new_event_vectors}
@@ -0,0 +1,237 @@
+from fractions import Fraction
+from capybara.eucalypt.transfer import get_receiver_index, get_distance_index
+from capybara.equivalence.event_vector import EventVector
+
+
+COSPECIATION, DUPLICATION, HOST_SWITCH = (1, 0, 0, 0), (0, 1, 0, 0), (0, 0, 1, 0)
+
+
+class CostRegion:
+    """
+    Convex polygon of the (duplication, host-switch) cost plane where the same event vectors are optimal
+    """
+    def __init__(self, vertices, event_vectors):
+        self.vertices = vertices
+        self.event_vectors = event_vectors
+        self.num_subsolutions = sum(vector.num_subsolutions for vector in event_vectors)
+
+    def __repr__(self):
+        polygon = ', '.join(f'({float(x):g}, {float(y):g})' for x, y in self.vertices)
+        return f'[{polygon}] {self.event_vectors}'
+
+    def area(self):
+        return polygon_area(self.vertices)
+
+    def contains(self, duplication_cost, switch_cost):
+        n = len(self.vertices)
+        for i in range(n):
+            (x1, y1), (x2, y2) = self.vertices[i], self.vertices[(i + 1) % n]
+            if (x2 - x1) * (switch_cost - y1) - (y2 - y1) * (duplication_cost - x1) < 0:
+                return False
+        return True
+
+
+def polygon_area(vertices):
+    n = len(vertices)
+    return abs(sum(vertices[i][0] * vertices[(i + 1) % n][1] - vertices[(i + 1) % n][0] * vertices[i][1]
+                   for i in range(n))) / 2
+
+
+def clip(vertices, a, b, c):
+    """
+    Sutherland-Hodgman clipping of a convex polygon by the half-plane a*x + b*y <= c
+    """
+    result = []
+    n = len(vertices)
+    for i in range(n):
+        current, following = vertices[i], vertices[(i + 1) % n]
+        current_value = a * current[0] + b * current[1] - c
+        following_value = a * following[0] + b * following[1] - c
+        if current_value <= 0:
+            result.append(current)
+        if (current_value < 0 < following_value) or (following_value < 0 < current_value):
+            t = current_value / (current_value - following_value)
+            result.append((current[0] + t * (following[0] - current[0]),
+                           current[1] + t * (following[1] - current[1])))
+    return result
+
+
+class CostLandscape:
+    """
+    Parametric dynamic programming over the duplication and host-switch costs
+
+    Each cell keeps, instead of a minimum, every event vector (with its number of solutions)
+    that is not dominated in (fixed cost, duplications, host-switches). A dominated event vector
+    can never be optimal for positive duplication and host-switch costs, and neither can any
+    combination using it, so the counts of the remaining vectors stay exact.
+    """
+    def __init__(self, host_tree, parasite_tree, leaf_map, cospeciation_cost, loss_cost,
+                 distance_threshold=float('Inf')):
+        self.host_tree = host_tree
+        self.parasite_tree = parasite_tree
+        self.leaf_map = leaf_map
+        self.cospeciation_cost = cospeciation_cost
+        self.loss_cost = loss_cost
+        self.distance_threshold = distance_threshold
+
+        self.receiver_index, self.distance_index = None, None
+        if distance_threshold < float('Inf'):
+            self.distance_index = get_distance_index(host_tree, int(distance_threshold))
+        else:
+            self.receiver_index = get_receiver_index(host_tree)
+
+        self.main = [None] * parasite_tree.size()
+        self.subtree = [None] * parasite_tree.size()
+
+    def fixed_cost(self, vector):
+        return self.cospeciation_cost * vector[0] + self.loss_cost * vector[3]
+
+    def pareto(self, vectors):
+        """
+        Remove the event vectors dominated in (fixed cost, duplications, host-switches)
+        """
+        if len(vectors) <= 1:
+            return vectors
+        keyed = sorted(((self.fixed_cost(vector), vector[1], vector[2]), vector) for vector in vectors)
+        kept, result = [], {}
+        for key, vector in keyed:
+            if any(other[0] <= key[0] and other[1] <= key[1] and other[2] <= key[2] and other != key
+                   for other in kept):
+                continue
+            kept.append(key)
+            result[vector] = vectors[vector]
+        return result
+
+    @staticmethod
+    def combine(first, second, event, num_losses):
+        result = {}
+        for first_vector, first_count in first.items():
+            for second_vector, second_count in second.items():
+                vector = (first_vector[0] + second_vector[0] + event[0],
+                          first_vector[1] + second_vector[1] + event[1],
+                          first_vector[2] + second_vector[2] + event[2],
+                          first_vector[3] + second_vector[3] + num_losses)
+                result[vector] = result.get(vector, 0) + first_count * second_count
+        return result
+
+    @staticmethod
+    def union(result, other, num_losses=0):
+        for vector, count in other.items():
+            if num_losses:
+                vector = vector[:3] + (vector[3] + num_losses,)
+            result[vector] = result.get(vector, 0) + count
+        return result
+
+    def run(self, duplication_range, switch_range):
+        """
+        Regions of the box duplication_range x switch_range, with their optimal event vectors
+        """
+        for parasite in self.parasite_tree:
+            if parasite.is_leaf():
+                self.fill_leaf_row(parasite)
+            else:
+                self.fill_row(parasite)
+
+        root = {}
+        for cell in self.main[self.parasite_tree.root.index]:
+            self.union(root, cell)
+        return self.regions(self.pareto(root), duplication_range, switch_range)
+
+    def fill_leaf_row(self, parasite):
+        main = [{} for _ in range(self.host_tree.size())]
+        subtree = [{} for _ in range(self.host_tree.size())]
+        host = self.leaf_map[parasite]
+        main[host.index] = {(0, 0, 0, 0): 1}
+        subtree[host.index] = main[host.index]
+
+        distance = 1
+        ancestor = host.parent
+        while ancestor:
+            subtree[ancestor.index] = {(0, 0, 0, distance): 1}
+            ancestor = ancestor.parent
+            distance += 1
+        self.main[parasite.index], self.subtree[parasite.index] = main, subtree
+
+    def transfer_row(self, main):
+        """
+        Union of the cells over the host-switch receivers of each host
+        """
+        if self.distance_index is not None:
+            result = []
+            for host in self.host_tree:
+                cell = {}
+                for receiver in self.distance_index.receiver_indices(host.index, self.distance_threshold):
+                    self.union(cell, main[receiver])
+                result.append(self.pareto(cell))
+            return result
+
+        index = self.receiver_index
+        subtree = [None] * index.size
+        for host_index in range(index.size):  # postorder
+            cell = dict(main[host_index])
+            if index.left[host_index] >= 0:
+                self.union(cell, subtree[index.left[host_index]])
+                self.union(cell, subtree[index.right[host_index]])
+            subtree[host_index] = self.pareto(cell)
+
+        incomparable = [{} for _ in range(index.size)]
+        for host_index in reversed(range(index.size)):  # reversed postorder
+            left, right = index.left[host_index], index.right[host_index]
+            if left >= 0:
+                incomparable[left] = self.pareto(self.union(dict(incomparable[host_index]), subtree[right]))
+                incomparable[right] = self.pareto(self.union(dict(incomparable[host_index]), subtree[left]))
+        return incomparable
+
+    def fill_row(self, parasite):
+        p1, p2 = parasite.left_child.index, parasite.right_child.index
+        main1, subtree1, main2, subtree2 = self.main[p1], self.subtree[p1], self.main[p2], self.subtree[p2]
+        transfer1, transfer2 = self.transfer_row(main1), self.transfer_row(main2)
+
+        main = [None] * self.host_tree.size()
+        subtree = [None] * self.host_tree.size()
+        for host in self.host_tree:
+            h = host.index
+            cell = self.combine(main1[h], main2[h], DUPLICATION, 0)
+            if not host.is_leaf():
+                left, right = host.left_child.index, host.right_child.index
+                self.union(cell, self.combine(subtree1[left], subtree2[right], COSPECIATION, 0))
+                self.union(cell, self.combine(subtree1[right], subtree2[left], COSPECIATION, 0))
+                self.union(cell, self.combine(main1[h], subtree2[left], DUPLICATION, 1))
+                self.union(cell, self.combine(main1[h], subtree2[right], DUPLICATION, 1))
+                self.union(cell, self.combine(subtree1[left], main2[h], DUPLICATION, 1))
+                self.union(cell, self.combine(subtree1[right], main2[h], DUPLICATION, 1))
+                self.union(cell, self.combine(subtree1[left], subtree2[left], DUPLICATION, 2))
+                self.union(cell, self.combine(subtree1[right], subtree2[right], DUPLICATION, 2))
+            self.union(cell, self.combine(transfer1[h], subtree2[h], HOST_SWITCH, 0))
+            self.union(cell, self.combine(subtree1[h], transfer2[h], HOST_SWITCH, 0))
+            main[h] = self.pareto(cell)
+
+        for host in self.host_tree:  # postorder, the children are done first
+            h = host.index
+            if host.is_leaf():
+                subtree[h] = main[h]
+            else:
+                cell = dict(main[h])
+                self.union(cell, subtree[host.left_child.index], 1)
+                self.union(cell, subtree[host.right_child.index], 1)
+                subtree[h] = self.pareto(cell)
+        self.main[parasite.index], self.subtree[parasite.index] = main, subtree
+
+    def regions(self, root, duplication_range, switch_range):
+        signatures = {}
+        for vector, count in root.items():
+            key = (self.fixed_cost(vector), vector[1], vector[2])
+            signatures.setdefault(key, []).append(EventVector(list(vector), count))
+
+        (x0, x1), (y0, y1) = map(Fraction, duplication_range), map(Fraction, switch_range)
+        box = [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+        regions = []
+        for key, event_vectors in signatures.items():
+            polygon = box
+            for other in signatures:
+                if other != key and polygon:
+                    # key is no worse than other: (D - D') x + (S - S') y <= F' - F
+                    polygon = clip(polygon, key[1] - other[1], key[2] - other[2], other[0] - key[0])
+            if len(polygon) >= 3 and polygon_area(polygon) > 0:
+                regions.append(CostRegion(polygon, event_vectors))
+        return regions
@@ -49,6 +49,38 @@ def signature_update_strong_class(table, node):
         table[signature].add(node)
 
 
+EMIT = object()  # yielded by a loop of nested_loops when it reaches a new combination
+
+
+def nested_loops(generator):
+    """
+    Run nested loops over generators without growing the call stack
+
+    A loop yields EMIT for each of its combinations, or the generator of an inner loop to advance it, and is sent back
+    True when the inner loop reached its next combination and False when it is exhausted.
+    Generate None for each combination of the outer loop
+    """
+    stack = [generator]
+    signal = None
+    while stack:
+        try:
+            item = stack[-1].send(signal)
+        except StopIteration:
+            stack.pop()
+            signal = False
+            continue
+        if item is EMIT:
+            stack.pop()  # suspended, its outer loop resumes it
+            signal = True
+            if not stack:
+                yield None
+                stack.append(generator)
+                signal = None
+            continue
+        stack.append(item)
+        signal = None
+
+
 class EnumTreeNode(TreeNode):
     def __init__(self, key, label):
         super().__init__(key)
@@ -103,8 +135,16 @@ class ClassEnumerator:
                 yield self.enum_tree.traverse()
 
     def recurse(self, current):
-        if current.is_leaf():
+        """
+        Generate current each time the subtree of current is marked with a new combination of signatures
+        """
+        for _ in nested_loops(self.recurse_(current)):
             yield current
+
+    def recurse_(self, current):
+        """The loops over the combinations of the children are yielded, see nested_loops"""
+        if current.is_leaf():
+            yield EMIT
             return
 
         base_nodes = current.nodes.copy()
@@ -112,16 +152,18 @@ class ClassEnumerator:
         for left_signature, left_nodes in self.recurse_side(current, 0):
             current.left_child.mark(left_signature, left_nodes)
 
-            for left in self.recurse(current.left_child):
+            left = self.recurse_(current.left_child)
+            while (yield left):
                 root_update(current, base_nodes, 0)
 
                 second_base_nodes = current.nodes.copy()
                 for right_signature, right_nodes in self.recurse_side(current, 1):
                     current.right_child.mark(right_signature, right_nodes)
 
-                    for right in self.recurse(current.right_child):
+                    right = self.recurse_(current.right_child)
+                    while (yield right):
                         root_update(current, second_base_nodes, 1)
-                        yield current
+                        yield EMIT
 
     def recurse_side(self, current, position):
         all_nodes = {}
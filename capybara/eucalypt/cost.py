@@ -0,0 +1,223 @@
+from capybara.eucalypt import parallel
+
+INF = float('Inf')
+
+
+def gather(row, indices):
+    """
+    Read the row at the given host indices, a negative index (no such host) reads as infinity
+    """
+    return [row[i] if i >= 0 else INF for i in indices]
+
+
+class CostMatrices:
+    """
+    Cost-only dynamic programming matrices, filled one symbiont row at a time across all hosts
+    """
+    def __init__(self, host_tree, parasite_tree, leaf_map,
+                 cospeciation_cost, duplication_cost, transfer_cost, loss_cost, receiver_index,
+                 allowed_transfers):
+        self.host_tree = host_tree
+        self.parasite_tree = parasite_tree
+        self.leaf_map = leaf_map
+        self.cospeciation_cost = cospeciation_cost
+        self.duplication_cost = duplication_cost
+        self.transfer_cost = transfer_cost
+        self.loss_cost = loss_cost
+
+        self.left = [-1 if host.is_leaf() else host.left_child.index for host in host_tree]
+        self.right = [-1 if host.is_leaf() else host.right_child.index for host in host_tree]
+        self.receiver_index = receiver_index
+        if receiver_index is None:
+            self.transfer_targets = [[target.index for target in allowed_transfers(host)] for host in host_tree]
+        else:
+            self.transfer_targets = None
+
+        self.main = [None] * parasite_tree.size()
+        self.subtree = [None] * parasite_tree.size()
+        self.receiver_rows = [None] * parasite_tree.size()  # subtree and incomparable minima of the main rows
+        self.main_used, self.subtree_used = None, None  # set by mark_optimal_cells
+
+    def __getstate__(self):
+        """
+        Only the host-tree data is sent to the worker processes, neither the trees nor the rows
+        """
+        state = self.__dict__.copy()
+        for key in ('host_tree', 'parasite_tree', 'leaf_map', 'main', 'subtree', 'receiver_rows',
+                    'main_used', 'subtree_used'):
+            state[key] = None
+        return state
+
+    def fill(self, processes=1):
+        if processes > 1:
+            parallel.fill_by_levels(self, processes)
+        else:
+            for parasite in self.parasite_tree:
+                self.fill_row(parasite)
+        return self.optimal_cost()
+
+    def optimal_cost(self):
+        return min(self.main[self.parasite_tree.root.index])
+
+    def mark_optimal_cells(self):
+        """
+        Flag the cells used by at least one optimal solution, walking down from the optimal root cells
+
+        A cell is used when it reaches its cost in a candidate reaching the cost of a used cell,
+        the same test as Reconciliator.candidate, so the other cells are never read by an optimal solution
+        """
+        size = self.host_tree.size()
+        self.main_used = [bytearray(size) for _ in range(self.parasite_tree.size())]
+        self.subtree_used = [bytearray(size) for _ in range(self.parasite_tree.size())]
+        root_index = self.parasite_tree.root.index
+        best = self.optimal_cost()
+        for host_index, cost in enumerate(self.main[root_index]):
+            if cost == best:
+                self.main_used[root_index][host_index] = 1
+
+        for parasite in reversed(list(self.parasite_tree)):  # reversed postorder, parents first
+            p = parasite.index
+            main, subtree = self.main[p], self.subtree[p]
+            main_used, subtree_used = self.main_used[p], self.subtree_used[p]
+            for host_index in reversed(range(size)):  # parents first, the losses go down the host tree
+                if not subtree_used[host_index]:
+                    continue
+                cost = subtree[host_index]
+                if main[host_index] == cost:
+                    main_used[host_index] = 1
+                for child in (self.left[host_index], self.right[host_index]):
+                    if child >= 0 and subtree[child] + self.loss_cost == cost:
+                        subtree_used[child] = 1
+            if not parasite.is_leaf():
+                self.mark_children(parasite)
+
+    @staticmethod
+    def mark_candidate(target, new_cost, first, first_host, second, second_host):
+        """
+        Flag the two cells of a candidate reaching the target, each of first and second is a pair (flags, costs)
+        """
+        if new_cost + first[1][first_host] + second[1][second_host] == target:
+            first[0][first_host] = 1
+            second[0][second_host] = 1
+
+    def mark_children(self, parasite):
+        p, p1, p2 = parasite.index, parasite.left_child.index, parasite.right_child.index
+        main1, subtree1 = (self.main_used[p1], self.main[p1]), (self.subtree_used[p1], self.subtree[p1])
+        main2, subtree2 = (self.main_used[p2], self.main[p2]), (self.subtree_used[p2], self.subtree[p2])
+        cospeciation_cost, duplication_cost = self.cospeciation_cost, self.duplication_cost
+        transfer_cost, loss_cost = self.transfer_cost, self.loss_cost
+        mark = self.mark_candidate
+
+        for h, used in enumerate(self.main_used[p]):
+            if not used:
+                continue
+            target = self.main[p][h]
+            mark(target, duplication_cost, main1, h, main2, h)
+            left, right = self.left[h], self.right[h]
+            if left >= 0:
+                mark(target, cospeciation_cost, subtree1, left, subtree2, right)
+                mark(target, cospeciation_cost, subtree1, right, subtree2, left)
+                mark(target, duplication_cost + loss_cost, main1, h, subtree2, left)
+                mark(target, duplication_cost + loss_cost, main1, h, subtree2, right)
+                mark(target, duplication_cost + loss_cost, subtree1, left, main2, h)
+                mark(target, duplication_cost + loss_cost, subtree1, right, main2, h)
+                mark(target, duplication_cost + loss_cost + loss_cost, subtree1, left, subtree2, left)
+                mark(target, duplication_cost + loss_cost + loss_cost, subtree1, right, subtree2, right)
+
+            if self.receiver_index is None:
+                receivers = self.transfer_targets[h]
+            else:
+                rows = [self.receiver_row(p1, target - transfer_cost - subtree2[1][h]),
+                        self.receiver_row(p2, target - transfer_cost - subtree1[1][h])]
+                receivers = [receiver for receiver, _ in self.receiver_index.receivers(h, rows)]
+            for receiver in receivers:
+                mark(target, transfer_cost, main1, receiver, subtree2, h)
+                mark(target, transfer_cost, subtree1, h, main2, receiver)
+
+    def fill_row(self, parasite):
+        if parasite.is_leaf():
+            main, subtree = self.leaf_row(parasite)
+            self.store_row(parasite.index, (main, subtree, self.best_receivers(main)))
+        else:
+            self.store_row(parasite.index, self.internal_row(self.get_row(parasite.left_child.index),
+                                                             self.get_row(parasite.right_child.index)))
+
+    def get_row(self, parasite_index):
+        return self.main[parasite_index], self.subtree[parasite_index], self.receiver_rows[parasite_index]
+
+    def store_row(self, parasite_index, row):
+        self.main[parasite_index], self.subtree[parasite_index], self.receiver_rows[parasite_index] = row
+
+    def internal_row(self, first, second):
+        """
+        Rows of a symbiont computed from the rows of its two children, without reading the matrices
+        """
+        main1, subtree1, receivers1 = first
+        main2, subtree2, receivers2 = second
+        main = self.main_row(main1, subtree1, self.transfer_row(main1, receivers1),
+                             main2, subtree2, self.transfer_row(main2, receivers2))
+        return main, self.subtree_row(main), self.best_receivers(main)
+
+    def best_receivers(self, main):
+        if self.receiver_index is None:
+            return None
+        return self.receiver_index.best_receivers(main)
+
+    def leaf_row(self, parasite):
+        host = self.leaf_map[parasite]
+        main = [INF] * self.host_tree.size()
+        subtree = [INF] * self.host_tree.size()
+        main[host.index] = 0
+        subtree[host.index] = 0
+
+        distance = 1
+        ancestor = host.parent
+        while ancestor:
+            subtree[ancestor.index] = self.loss_cost * distance
+            ancestor = ancestor.parent
+            distance += 1
+        return main, subtree
+
+    def main_row(self, main1, subtree1, transfer1, main2, subtree2, transfer2):
+        """
+        Best cost of mapping a symbiont onto each host, given the rows of its two children
+        """
+        cospeciation_cost, duplication_cost = self.cospeciation_cost, self.duplication_cost
+        transfer_cost, loss_cost = self.transfer_cost, self.loss_cost
+
+        subtree1_left, subtree1_right = gather(subtree1, self.left), gather(subtree1, self.right)
+        subtree2_left, subtree2_right = gather(subtree2, self.left), gather(subtree2, self.right)
+
+        cospeciation = [cospeciation_cost + min(a + d, b + c)
+                        for a, b, c, d in zip(subtree1_left, subtree1_right, subtree2_left, subtree2_right)]
+        duplication = [duplication_cost + min(m1 + m2,
+                                              loss_cost + m1 + min(c, d),
+                                              loss_cost + m2 + min(a, b),
+                                              loss_cost + loss_cost + min(a + c, b + d))
+                       for m1, m2, a, b, c, d in zip(main1, main2, subtree1_left, subtree1_right,
+                                                     subtree2_left, subtree2_right)]
+        transfer = [transfer_cost + min(t1 + s2, s1 + t2)
+                    for t1, t2, s1, s2 in zip(transfer1, transfer2, subtree1, subtree2)]
+        return [min(c, d, t) for c, d, t in zip(cospeciation, duplication, transfer)]
+
+    def transfer_row(self, main, receivers):
+        """
+        Best cost of each host-switch receiver, for every host
+        """
+        if receivers is not None:
+            return receivers[1]
+        return [min((main[j] for j in targets), default=INF) for targets in self.transfer_targets]
+
+    def receiver_row(self, parasite_index, cost):
+        """
+        The row to pass to ReceiverIndex.receivers for finding the receivers of the given cost
+        """
+        return self.main[parasite_index], self.receiver_rows[parasite_index][0], cost
+
+    def subtree_row(self, main):
+        loss_cost = self.loss_cost
+        subtree = main[:]
+        for host_index, (left, right) in enumerate(zip(self.left, self.right)):
+            if left >= 0:
+                subtree[host_index] = min(main[host_index], loss_cost + subtree[left], loss_cost + subtree[right])
+        return subtree
@@ -0,0 +1,330 @@
+from capybara.eucalypt.cost import CostMatrices, INF
+from capybara.eucalypt.transfer import get_receiver_index, get_distance_index
+
+
+class CountMatrices(CostMatrices):
+    """
+    Optimal cost and number of optimal solutions of each cell, without building the solutions
+
+    The counts follow the candidates of Reconciliator.fill_matrices_at, so they are the num_subsolutions
+    of the solution DAG. The rows of a symbiont are freed as soon as the row of its parent is filled,
+    so only the rows waiting for their sibling are kept in memory.
+    With approximate, the counts are floats instead of exact integers
+    """
+    def __init__(self, host_tree, parasite_tree, leaf_map,
+                 cospeciation_cost, duplication_cost, transfer_cost, loss_cost, receiver_index,
+                 allowed_transfers, approximate=False):
+        super().__init__(host_tree, parasite_tree, leaf_map,
+                         cospeciation_cost, duplication_cost, transfer_cost, loss_cost, receiver_index,
+                         allowed_transfers)
+        self.one = 1.0 if approximate else 1  # every other count is a sum of products of leaf counts
+        self.main_count = [None] * parasite_tree.size()
+        self.subtree_count = [None] * parasite_tree.size()
+
+    def count(self):
+        """
+        The optimal cost and the number of optimal solutions
+        """
+        for parasite in self.parasite_tree:
+            self.fill_row(parasite)
+        root_index = self.parasite_tree.root.index
+        best = self.optimal_cost()
+        if best == INF:
+            return best, 0
+        return best, sum(count for cost, count in zip(self.main[root_index], self.main_count[root_index])
+                         if cost == best)
+
+    def fill_row(self, parasite):
+        super().fill_row(parasite)
+        p = parasite.index
+        if parasite.is_leaf():
+            self.main_count[p] = [0 if cost == INF else self.one for cost in self.main[p]]
+            self.subtree_count[p] = [0 if cost == INF else self.one for cost in self.subtree[p]]
+        else:
+            self.main_count[p] = self.main_count_row(parasite)
+            self.subtree_count[p] = self.subtree_count_row(p)
+            self.free_row(parasite.left_child.index)
+            self.free_row(parasite.right_child.index)
+
+    def free_row(self, parasite_index):
+        self.main[parasite_index], self.subtree[parasite_index] = None, None
+        self.receiver_rows[parasite_index] = None
+        self.main_count[parasite_index], self.subtree_count[parasite_index] = None, None
+
+    @staticmethod
+    def candidate_count(target, new_cost, first, first_host, second, second_host):
+        """
+        Number of solutions of a candidate reaching the target, each of first and second is a pair (costs, counts)
+        """
+        if new_cost + first[0][first_host] + second[0][second_host] == target:
+            return first[1][first_host] * second[1][second_host]
+        return 0
+
+    def transfer_counts(self, parasite_index):
+        """
+        Best cost over the host-switch receivers of each host, and the number of solutions reaching it
+        """
+        main, counts = self.main[parasite_index], self.main_count[parasite_index]
+        if self.receiver_index is None:
+            best, best_counts = [], []
+            for targets in self.transfer_targets:
+                cost = min((main[j] for j in targets), default=INF)
+                best.append(cost)
+                best_counts.append(0 if cost == INF else sum(counts[j] for j in targets if main[j] == cost))
+            return best, best_counts
+
+        index = self.receiver_index
+        subtree, incomparable = self.receiver_rows[parasite_index]
+        subtree_counts = [0 if cost == INF else count for cost, count in zip(main, counts)]
+        for host_index in range(index.size):  # postorder, children first
+            left = index.left[host_index]
+            if left >= 0:
+                right, cost = index.right[host_index], subtree[host_index]
+                subtree_counts[host_index] = (
+                    (subtree_counts[host_index] if main[host_index] == cost else 0)
+                    + (subtree_counts[left] if subtree[left] == cost else 0)
+                    + (subtree_counts[right] if subtree[right] == cost else 0))
+
+        incomparable_counts = [0] * index.size
+        for host_index in reversed(range(index.size)):  # reversed postorder, parents first
+            left = index.left[host_index]
+            if left >= 0:
+                right = index.right[host_index]
+                for child, other in ((left, right), (right, left)):
+                    cost = incomparable[child]
+                    if cost < INF:
+                        incomparable_counts[child] = (
+                            (incomparable_counts[host_index] if incomparable[host_index] == cost else 0)
+                            + (subtree_counts[other] if subtree[other] == cost else 0))
+        return incomparable, incomparable_counts
+
+    def main_count_row(self, parasite):
+        p1, p2 = parasite.left_child.index, parasite.right_child.index
+        main1, subtree1 = (self.main[p1], self.main_count[p1]), (self.subtree[p1], self.subtree_count[p1])
+        main2, subtree2 = (self.main[p2], self.main_count[p2]), (self.subtree[p2], self.subtree_count[p2])
+        transfer1, transfer2 = self.transfer_counts(p1), self.transfer_counts(p2)
+        cospeciation_cost, duplication_cost = self.cospeciation_cost, self.duplication_cost
+        transfer_cost, loss_cost = self.transfer_cost, self.loss_cost
+        pair = self.candidate_count
+
+        counts = [0] * self.host_tree.size()
+        for h, target in enumerate(self.main[parasite.index]):
+            if target == INF:
+                continue
+            count = pair(target, duplication_cost, main1, h, main2, h)
+            left, right = self.left[h], self.right[h]
+            if left >= 0:
+                count += (pair(target, cospeciation_cost, subtree1, left, subtree2, right)
+                          + pair(target, cospeciation_cost, subtree1, right, subtree2, left)
+                          + pair(target, duplication_cost + loss_cost, main1, h, subtree2, left)
+                          + pair(target, duplication_cost + loss_cost, main1, h, subtree2, right)
+                          + pair(target, duplication_cost + loss_cost, subtree1, left, main2, h)
+                          + pair(target, duplication_cost + loss_cost, subtree1, right, main2, h)
+                          + pair(target, duplication_cost + loss_cost + loss_cost, subtree1, left, subtree2, left)
+                          + pair(target, duplication_cost + loss_cost + loss_cost,
+                                 subtree1, right, subtree2, right))
+            count += (pair(target, transfer_cost, transfer1, h, subtree2, h)
+                      + pair(target, transfer_cost, subtree1, h, transfer2, h))
+            counts[h] = count
+        return counts
+
+    def subtree_count_row(self, parasite_index):
+        main, subtree = self.main[parasite_index], self.subtree[parasite_index]
+        counts = self.main_count[parasite_index][:]
+        for host_index, (left, right) in enumerate(zip(self.left, self.right)):  # postorder, children first
+            if left >= 0:
+                cost = subtree[host_index]
+                if cost == INF:
+                    counts[host_index] = 0
+                    continue
+                counts[host_index] = ((counts[host_index] if main[host_index] == cost else 0)
+                                      + (counts[left] if subtree[left] + self.loss_cost == cost else 0)
+                                      + (counts[right] if subtree[right] + self.loss_cost == cost else 0))
+        return counts
+
+
+def host_switch_indices(host_tree, distance_threshold):
+    """
+    The receiver index and the allowed transfers function for CostMatrices, same choice as in Reconciliator
+    """
+    if distance_threshold < float('Inf'):
+        distance_index = get_distance_index(host_tree, int(distance_threshold))
+
+        def allowed_transfers(host):
+            return distance_index.allowed_transfers(host, distance_threshold)
+        return None, allowed_transfers
+    return get_receiver_index(host_tree), None
+
+
+def count_optimal_solutions(host_tree, parasite_tree, leaf_map,
+                            cospeciation_cost, duplication_cost, transfer_cost, loss_cost, distance_threshold,
+                            approximate=False):
+    """
+    The optimal cost and the number of optimal solutions
+    """
+    receiver_index, allowed_transfers = host_switch_indices(host_tree, distance_threshold)
+    count_matrices = CountMatrices(host_tree, parasite_tree, leaf_map,
+                                   cospeciation_cost, duplication_cost, transfer_cost, loss_cost,
+                                   receiver_index, allowed_transfers, approximate)
+    return count_matrices.count()
+
+
+def cost_histogram(host_tree, parasite_tree, leaf_map,
+                   cospeciation_cost, duplication_cost, transfer_cost, loss_cost, distance_threshold, delta):
+    """
+    The number of solutions of each cost up to the optimal cost plus delta
+    """
+    receiver_index, allowed_transfers = host_switch_indices(host_tree, distance_threshold)
+    histogram_matrices = HistogramMatrices(host_tree, parasite_tree, leaf_map,
+                                           cospeciation_cost, duplication_cost, transfer_cost, loss_cost,
+                                           receiver_index, allowed_transfers, delta)
+    return histogram_matrices.histogram()
+
+
+def add_histogram(result, histogram, shift, bound):
+    """
+    Add the counts of a histogram (cost to number of solutions) shifted by a cost, up to the bound
+    """
+    for cost, count in histogram.items():
+        cost += shift
+        if cost <= bound:
+            result[cost] = result.get(cost, 0) + count
+    return result
+
+
+class HistogramMatrices(CostMatrices):
+    """
+    Number of solutions of each cost up to the optimal cost plus delta, without building the solutions
+
+    A cell only keeps the costs up to its own optimal cost plus delta. This is exact: replacing the part of
+    a solution in a cell by an optimal one keeps a solution, so a solution within delta of the optimum
+    is also within delta of the optimum in each of its cells. The rows are freed as in CountMatrices
+    """
+    def __init__(self, host_tree, parasite_tree, leaf_map,
+                 cospeciation_cost, duplication_cost, transfer_cost, loss_cost, receiver_index,
+                 allowed_transfers, delta):
+        super().__init__(host_tree, parasite_tree, leaf_map,
+                         cospeciation_cost, duplication_cost, transfer_cost, loss_cost, receiver_index,
+                         allowed_transfers)
+        self.delta = delta
+        self.main_histogram = [None] * parasite_tree.size()
+        self.subtree_histogram = [None] * parasite_tree.size()
+
+    def histogram(self):
+        """
+        The number of solutions of each cost up to the optimal cost plus delta
+        """
+        for parasite in self.parasite_tree:
+            self.fill_row(parasite)
+        result = {}
+        bound = self.optimal_cost() + self.delta
+        for histogram in self.main_histogram[self.parasite_tree.root.index]:
+            add_histogram(result, histogram, 0, bound)
+        return dict(sorted(result.items()))
+
+    def fill_row(self, parasite):
+        super().fill_row(parasite)
+        p = parasite.index
+        if parasite.is_leaf():
+            self.main_histogram[p] = [{} if cost == INF else {cost: 1} for cost in self.main[p]]
+            self.subtree_histogram[p] = [{} if cost == INF else {cost: 1} for cost in self.subtree[p]]
+        else:
+            self.main_histogram[p] = self.main_histogram_row(parasite)
+            self.subtree_histogram[p] = self.subtree_histogram_row(p)
+            self.free_row(parasite.left_child.index)
+            self.free_row(parasite.right_child.index)
+
+    def free_row(self, parasite_index):
+        self.main[parasite_index], self.subtree[parasite_index] = None, None
+        self.receiver_rows[parasite_index] = None
+        self.main_histogram[parasite_index], self.subtree_histogram[parasite_index] = None, None
+
+    @staticmethod
+    def add_candidate(result, new_cost, first, second, bound):
+        for first_cost, first_count in first.items():
+            for second_cost, second_count in second.items():
+                cost = new_cost + first_cost + second_cost
+                if cost <= bound:
+                    result[cost] = result.get(cost, 0) + first_count * second_count
+
+    def transfer_histograms(self, parasite_index):
+        """
+        Union of the histograms of the host-switch receivers of each host
+        """
+        main, histograms = self.main[parasite_index], self.main_histogram[parasite_index]
+        delta = self.delta
+        if self.receiver_index is None:
+            result = []
+            for targets in self.transfer_targets:
+                bound = min((main[j] for j in targets), default=INF) + delta
+                cell = {}
+                for j in targets:
+                    add_histogram(cell, histograms[j], 0, bound)
+                result.append(cell)
+            return result
+
+        index = self.receiver_index
+        subtree, incomparable = self.receiver_rows[parasite_index]
+        subtree_histograms = histograms[:]
+        for host_index in range(index.size):  # postorder, children first
+            left = index.left[host_index]
+            if left >= 0:
+                bound = subtree[host_index] + delta
+                cell = add_histogram({}, histograms[host_index], 0, bound)
+                add_histogram(cell, subtree_histograms[left], 0, bound)
+                add_histogram(cell, subtree_histograms[index.right[host_index]], 0, bound)
+                subtree_histograms[host_index] = cell
+
+        incomparable_histograms = [{} for _ in range(index.size)]
+        for host_index in reversed(range(index.size)):  # reversed postorder, parents first
+            left = index.left[host_index]
+            if left >= 0:
+                right = index.right[host_index]
+                for child, other in ((left, right), (right, left)):
+                    bound = incomparable[child] + delta
+                    cell = add_histogram({}, incomparable_histograms[host_index], 0, bound)
+                    incomparable_histograms[child] = add_histogram(cell, subtree_histograms[other], 0, bound)
+        return incomparable_histograms
+
+    def main_histogram_row(self, parasite):
+        p1, p2 = parasite.left_child.index, parasite.right_child.index
+        main1, subtree1 = self.main_histogram[p1], self.subtree_histogram[p1]
+        main2, subtree2 = self.main_histogram[p2], self.subtree_histogram[p2]
+        transfer1, transfer2 = self.transfer_histograms(p1), self.transfer_histograms(p2)
+        cospeciation_cost, duplication_cost = self.cospeciation_cost, self.duplication_cost
+        transfer_cost, loss_cost = self.transfer_cost, self.loss_cost
+        add = self.add_candidate
+
+        result = []
+        for h, cost in enumerate(self.main[parasite.index]):
+            cell = {}
+            result.append(cell)
+            if cost == INF:
+                continue
+            bound = cost + self.delta
+            add(cell, duplication_cost, main1[h], main2[h], bound)
+            left, right = self.left[h], self.right[h]
+            if left >= 0:
+                add(cell, cospeciation_cost, subtree1[left], subtree2[right], bound)
+                add(cell, cospeciation_cost, subtree1[right], subtree2[left], bound)
+                add(cell, duplication_cost + loss_cost, main1[h], subtree2[left], bound)
+                add(cell, duplication_cost + loss_cost, main1[h], subtree2[right], bound)
+                add(cell, duplication_cost + loss_cost, subtree1[left], main2[h], bound)
+                add(cell, duplication_cost + loss_cost, subtree1[right], main2[h], bound)
+                add(cell, duplication_cost + loss_cost + loss_cost, subtree1[left], subtree2[left], bound)
+                add(cell, duplication_cost + loss_cost + loss_cost, subtree1[right], subtree2[right], bound)
+            add(cell, transfer_cost, transfer1[h], subtree2[h], bound)
+            add(cell, transfer_cost, subtree1[h], transfer2[h], bound)
+        return result
+
+    def subtree_histogram_row(self, parasite_index):
+        subtree = self.subtree[parasite_index]
+        histograms = self.main_histogram[parasite_index][:]
+        for host_index, (left, right) in enumerate(zip(self.left, self.right)):  # postorder, children first
+            if left >= 0:
+                bound = subtree[host_index] + self.delta
+                cell = add_histogram({}, histograms[host_index], 0, bound)
+                add_histogram(cell, histograms[left], self.loss_cost, bound)
+                add_histogram(cell, histograms[right], self.loss_cost, bound)
+                histograms[host_index] = cell
+        return histograms
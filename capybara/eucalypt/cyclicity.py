@@ -2,11 +2,20 @@ import collections
 from capybara.eucalypt import util
 
 
-def find_transfer_edges(host_tree, mapping, transfer_candidates):
+def find_transfer_edges(host_tree, mapping, transfer_candidates, lca_index=None):
     """
     Find the set of transfer edges in the solution defined by the mapping
-    knowing that a host-switch happens at p for p in transfer candidates
+    knowing that a host-switch happens at p for p in transfer candidates,
+    with an LCA index of the host tree each edge is checked in constant time
     """
+    if lca_index is not None:
+        pairs = []
+        for p in transfer_candidates:
+            h = mapping[p]
+            for child in (p.left_child, p.right_child):
+                pairs.append((h, mapping[child], (p, child)))
+        return util.transfer_edges_from_lca(lca_index, pairs)
+
     pairs = collections.defaultdict(list)
     for p in transfer_candidates:
         h = mapping[p]
@@ -36,11 +45,11 @@ def is_acyclic_stolzer(mapping, transfer_edges):
         graph[d.parent] = {d}
         graph[r.parent] = {r}
 
-    # condition 1
+    # condition 1, the proper descendants of a host cover the post-order indices from its start to its index
     for node in graph:
-        descendants = node.get_proper_descendants()
-        for d in descendants:
-            if d in graph:
+        start, end = node.tree.start[node.index], node.index
+        for d in graph:
+            if start <= d.index < end:
                 graph[node].add(d)
 
     for g, h in transfer_edges:
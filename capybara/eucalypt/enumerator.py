@@ -111,7 +111,8 @@ class SolutionsEnumerator:
             is_acyclic = False
             if self.acyclic_only:
                 transfer_edges = cyclicity.find_transfer_edges(self.data.host_tree,
-                                                               self.current_mapping, self.transfer_candidates)
+                                                               self.current_mapping, self.transfer_candidates,
+                                                               self.data.get_lca_index())
                 if not transfer_edges:
                     is_acyclic = True
                 else:
@@ -174,25 +175,35 @@ class SolutionsEnumerator:
 
     def visit_vector(self, solution, target_vector):
         """
-        Recursive function in Event Vector Enumeration loop for extracting one solution
+        Extract one solution of the target event vector in Event Vector Enumeration loop
         """
-        if solution.composition_type == NestedSolution.MULTIPLE:
-            for child in solution.children:
-                if target_vector in child.event_vectors:
-                    self.visit_vector(child, target_vector)
-                    return
-        elif solution.composition_type == NestedSolution.FINAL:
-            self.current_mapping[solution.association.parasite] = solution.association.host
-            self.current_text.append(str(solution.association))
-        else:
+        stack = [(solution, target_vector)]  # the right subsolution waits below the left one
+        while stack:
+            solution, target_vector = stack.pop()
+            if solution.composition_type == NestedSolution.MULTIPLE:
+                if solution.num_losses:  # the losses above the children
+                    target_vector = target_vector.remove_losses(solution.num_losses)
+                for child in solution.children:
+                    if target_vector in child.event_vectors:
+                        stack.append((child, target_vector))
+                        break
+                continue
+
             self.current_mapping[solution.association.parasite] = solution.association.host
             self.current_text.append(str(solution.association))
+            if solution.composition_type == NestedSolution.FINAL:
+                continue
+            for left_vector, right_vector in self.split_vector(solution, target_vector):
+                stack.append((solution.children[1], right_vector))
+                stack.append((solution.children[0], left_vector))
+                break
 
-            for left_vector in solution.children[0].event_vectors:
-                for right_vector in solution.children[1].event_vectors:
-                    new_vec = left_vector.cartesian(right_vector, solution.event, solution.num_losses)
-                    if new_vec == target_vector:
-                        self.visit_vector(solution.children[0], left_vector)
-                        self.visit_vector(solution.children[1], right_vector)
-                        return
-
+    @staticmethod
+    def split_vector(solution, target_vector):
+        """
+        The pairs of child event vectors making up the target vector of a composed solution
+        """
+        for left_vector in solution.children[0].event_vectors:
+            for right_vector in solution.children[1].event_vectors:
+                if left_vector.cartesian(right_vector, solution.event, solution.num_losses) == target_vector:
+                    yield left_vector, right_vector
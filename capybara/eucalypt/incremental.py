@@ -0,0 +1,133 @@
+from capybara.eucalypt.nexparser import tree_from_newick
+from capybara.eucalypt.reconciliator import ReconciliatorCounter
+from capybara.eucalypt.sparse import SparseRow
+
+
+class IncrementalReconciliator(ReconciliatorCounter):
+    """
+    Reconciliation kept in memory, so that an edit of the leaf map or of a symbiont subtree
+    only recomputes the rows on the path from the edited node to the root
+
+    The edits apply to copies of the symbiont tree and of the leaf map, the edited problem is read from
+    parasite_tree and leaf_map, and the given tree and leaf map are left unchanged
+    """
+    prune = False  # an edit can make any cell optimal, so every cell is kept
+
+    def __init__(self, host_tree, parasite_tree, leaf_map,
+                 cospeciation_cost, duplication_cost, transfer_cost, loss_cost, distance_threshold, task, cli):
+        parasite_copy = parasite_tree.copy()
+        leaf_copy = {parasite_copy.nodes[parasite.index]: host for parasite, host in leaf_map.items()}
+        super().__init__(host_tree, parasite_copy, leaf_copy,
+                         cospeciation_cost, duplication_cost, transfer_cost, loss_cost, distance_threshold, task, cli)
+        self.root = None
+
+    def run(self):
+        self.root = super().run()
+        return self.root
+
+    def empty_row(self):
+        return SparseRow(self.host_tree.size(), self.solution_generator.empty_solution())
+
+    def refill_row(self, parasite):
+        self.cost_matrices.fill_row(parasite)
+        self.main_matrix[parasite.index] = self.empty_row()
+        self.subtree_matrix[parasite.index] = self.empty_row()
+        if parasite.is_leaf():
+            self.initialize_leaf_row(parasite, self.leaf_map[parasite])
+        else:
+            for host in self.host_tree:
+                self.fill_matrices_at(parasite, host)
+
+    def refill_path(self, parasite):
+        """
+        Recompute the rows of the node and of all its ancestors, the other rows are unchanged
+        """
+        while parasite is not None:
+            self.refill_row(parasite)
+            parasite = parasite.parent
+        self.root = self.finishing_up()
+        return self.root
+
+    def find_parasite(self, parasite_label):
+        for parasite in self.parasite_tree:
+            if parasite.label == parasite_label:
+                return parasite
+        raise ValueError(f'No symbiont node is labeled {parasite_label}.')
+
+    def find_host_leaf(self, host_label):
+        for host in self.host_tree:
+            if host.is_leaf() and host.label == host_label:
+                return host
+        raise ValueError(f'No host leaf is labeled {host_label}.')
+
+    def update_leaf_map(self, parasite_label, host_label):
+        """
+        Map a symbiont leaf onto another host leaf, and return the new optimal solutions
+        """
+        parasite = self.find_parasite(parasite_label)
+        if not parasite.is_leaf():
+            raise ValueError(f'The symbiont node {parasite_label} is not a leaf.')
+        self.leaf_map[parasite] = self.find_host_leaf(host_label)
+        return self.refill_path(parasite)
+
+    def replace_subtree(self, parasite_label, newick, leaf_labels):
+        """
+        Replace the symbiont subtree rooted at the labeled node by a Newick subtree,
+        leaf_labels maps each new symbiont leaf label to a host leaf label
+        """
+        old_node = self.find_parasite(parasite_label)
+        new_tree = tree_from_newick(newick, '!P')
+        if not new_tree or not new_tree.is_full():
+            raise ValueError('Malformed symbiont subtree.')
+
+        # give fresh labels to the unnamed nodes, node equality relies on the labels
+        old_nodes = [parasite for parasite in self.parasite_tree if not old_node.is_ancestor_of(parasite)]
+        used_labels = {parasite.label for parasite in old_nodes}
+        next_key = 1 + max((parasite.key for parasite in old_nodes if isinstance(parasite.key, int)), default=-1)
+        new_leaf_map = {}
+        for parasite in new_tree:
+            if parasite.label == '!P' + str(parasite.key):
+                parasite.key = next_key
+                parasite.set_label('!P' + str(next_key))
+                next_key += 1
+            if parasite.label in used_labels:
+                raise ValueError(f'The symbiont label {parasite.label} is already used.')
+            used_labels.add(parasite.label)  # the labels of the new subtree must differ too
+            if parasite.is_leaf():
+                if parasite.label not in leaf_labels:
+                    raise ValueError(f'The symbiont leaf {parasite.label} is not mapped.')
+                new_leaf_map[parasite] = self.find_host_leaf(leaf_labels[parasite.label])
+
+        # keep the rows of the untouched nodes, and graft the new subtree
+        rows = {parasite: (self.main_matrix[parasite.index], self.subtree_matrix[parasite.index],
+                           self.cost_matrices.get_row(parasite.index)) for parasite in old_nodes}
+        for parasite in self.parasite_tree:
+            if old_node.is_ancestor_of(parasite) and parasite.is_leaf():
+                del self.leaf_map[parasite]
+        self.leaf_map.update(new_leaf_map)
+
+        new_root = new_tree.root
+        parent = old_node.parent
+        if parent is None:
+            self.parasite_tree.root = new_root
+        elif parent.left_child is old_node:
+            parent.left_child = new_root
+        else:
+            parent.right_child = new_root
+        new_root.parent = parent
+
+        self.parasite_tree.nodes = []
+        self.parasite_tree.linearize()
+        size = self.parasite_tree.size()
+        self.main_matrix, self.subtree_matrix = [None] * size, [None] * size
+        self.cost_matrices.main, self.cost_matrices.subtree = [None] * size, [None] * size
+        self.cost_matrices.receiver_rows = [None] * size
+        for parasite, (main, subtree, cost_row) in rows.items():
+            self.main_matrix[parasite.index], self.subtree_matrix[parasite.index] = main, subtree
+            self.cost_matrices.store_row(parasite.index, cost_row)
+
+        # the new subtree is filled from the bottom, then the path to the root
+        for parasite in new_tree:
+            if parasite is not new_root:
+                self.refill_row(parasite)
+        return self.refill_path(new_root)
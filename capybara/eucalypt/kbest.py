@@ -0,0 +1,209 @@
+import heapq
+import itertools
+from capybara.eucalypt.cost import INF
+from capybara.eucalypt.solution import Association, NestedSolution
+from capybara.eucalypt.util import trampoline
+
+
+MAIN, SUBTREE, ROOT = 0, 1, 2  # kinds of cells
+COMPOSE, SAME, LOSS, LEAF = 0, 1, 2, 3  # kinds of edges
+
+
+class LazyBestK:
+    """
+    Best solutions in increasing cost order, following the lazy k-best algorithm of Huang and Chiang (2005)
+
+    A cell is either a main cell (MAIN, p, h), a subtree cell (SUBTREE, p, h) or the root (ROOT, -1, -1).
+    A derivation of a cell is one of its incoming edges with a rank in each tail cell. The best cost of every cell
+    comes from the cost-only matrices, and the next derivations of a cell are only computed when a parent
+    asks for them, so the K best solutions visit few cells besides the optimal ones
+    """
+    def __init__(self, reconciliator):
+        self.recon = reconciliator
+        self.cost_matrices = reconciliator.cost_matrices
+        self.solution_generator = reconciliator.solution_generator
+        self.parasites = list(reconciliator.parasite_tree)
+        self.hosts = list(reconciliator.host_tree)
+
+        self.edges = {}
+        self.derivations = {}
+        self.candidates = {}
+        self.seen = {}
+        self.expanded = {}  # number of derivations of a cell whose successors are candidates
+        self.solutions = {}
+        self.sequence = itertools.count()  # ties are broken by insertion order
+
+    def best(self, k):
+        """
+        The solutions of the K best derivations of the root, fewer if there are not enough solutions
+        """
+        root = ROOT, -1, -1
+        solutions = []
+        for rank in range(k):
+            if self.derivation(root, rank) is None:
+                break
+            solutions.append(self.solution(root, rank))
+        return solutions
+
+    def cost(self, cell):
+        kind, p, h = cell
+        if kind == MAIN:
+            return self.cost_matrices.main[p][h]
+        return self.cost_matrices.subtree[p][h]
+
+    def derivation(self, cell, rank):
+        """
+        The derivation of the given rank of a cell, as (cost, sequence, edge index, tail ranks), or None
+        """
+        derivations = self.derivations.get(cell)
+        if derivations is not None and rank < len(derivations):
+            return derivations[rank]
+        return trampoline(self.derivation_(cell, rank))
+
+    def derivation_(self, cell, rank):
+        """The recursive calls are yielded, see trampoline"""
+        derivations = self.derivations.get(cell)
+        if derivations is None:
+            derivations = self.init_cell(cell)
+        candidates = self.candidates[cell]
+        while len(derivations) <= rank:
+            if self.expanded[cell] < len(derivations):
+                yield self.push_successors_(cell, derivations[-1])
+                self.expanded[cell] = len(derivations)
+            if not candidates:
+                return None
+            derivations.append(heapq.heappop(candidates))
+        return derivations[rank]
+
+    def init_cell(self, cell):
+        edges = self.get_edges(cell)
+        candidates, seen = [], set()
+        for edge_index, (_, new_cost, tails, _) in enumerate(edges):
+            cost = new_cost + sum(self.cost(tail) for tail in tails)
+            if cost < INF:
+                ranks = (0,) * len(tails)
+                seen.add((edge_index, ranks))
+                candidates.append((cost, next(self.sequence), edge_index, ranks))
+        heapq.heapify(candidates)
+        self.edges[cell], self.candidates[cell], self.seen[cell] = edges, candidates, seen
+        self.expanded[cell] = 0
+        self.derivations[cell] = []
+        return self.derivations[cell]
+
+    def push_successors_(self, cell, derivation):
+        """
+        Add the candidates using the next derivation of one of the tails of the given derivation
+        """
+        _, _, edge_index, ranks = derivation
+        _, new_cost, tails, _ = self.edges[cell][edge_index]
+        for i in range(len(tails)):
+            next_ranks = ranks[:i] + (ranks[i] + 1,) + ranks[i + 1:]
+            if (edge_index, next_ranks) in self.seen[cell]:
+                continue
+            self.seen[cell].add((edge_index, next_ranks))
+            tail_derivations = []
+            for tail, rank in zip(tails, next_ranks):
+                tail_derivation = yield self.derivation_(tail, rank)
+                tail_derivations.append(tail_derivation)
+            if any(tail_derivation is None for tail_derivation in tail_derivations):
+                continue
+            cost = new_cost + sum(tail_derivation[0] for tail_derivation in tail_derivations)
+            heapq.heappush(self.candidates[cell], (cost, next(self.sequence), edge_index, next_ranks))
+
+    def get_edges(self, cell):
+        """
+        The incoming edges of a cell as (kind, new cost, tail cells, payload), same candidates as Reconciliator
+        """
+        kind, p, h = cell
+        if kind == ROOT:
+            root_index = self.recon.parasite_tree.root.index
+            return [(SAME, 0, ((MAIN, root_index, host.index),), None) for host in self.hosts]
+
+        parasite, host = self.parasites[p], self.hosts[h]
+        if parasite.is_leaf():
+            return self.leaf_edges(kind, parasite, host)
+        if kind == SUBTREE:
+            edges = [(SAME, 0, ((MAIN, p, h),), None)]
+            if not host.is_leaf():
+                edges.append((LOSS, self.recon.loss_cost, ((SUBTREE, p, host.left_child.index),), None))
+                edges.append((LOSS, self.recon.loss_cost, ((SUBTREE, p, host.right_child.index),), None))
+            return edges
+
+        recon = self.recon
+        p1, p2 = parasite.left_child.index, parasite.right_child.index
+        association = Association(parasite, host)
+        edges = []
+
+        def compose(new_cost, first, second, event, num_losses):
+            edges.append((COMPOSE, new_cost, (first, second), (association, event, num_losses)))
+
+        if not host.is_leaf():
+            left, right = host.left_child.index, host.right_child.index
+            cospeciation, duplication = NestedSolution.COSPECIATION, NestedSolution.DUPLICATION
+            compose(recon.cospeciation_cost, (SUBTREE, p1, left), (SUBTREE, p2, right), cospeciation, 0)
+            compose(recon.cospeciation_cost, (SUBTREE, p1, right), (SUBTREE, p2, left), cospeciation, 0)
+            duplication_loss_cost = recon.duplication_cost + recon.loss_cost
+            compose(recon.duplication_cost, (MAIN, p1, h), (MAIN, p2, h), duplication, 0)
+            compose(duplication_loss_cost, (MAIN, p1, h), (SUBTREE, p2, left), duplication, 1)
+            compose(duplication_loss_cost, (MAIN, p1, h), (SUBTREE, p2, right), duplication, 1)
+            compose(duplication_loss_cost, (SUBTREE, p1, left), (MAIN, p2, h), duplication, 1)
+            compose(duplication_loss_cost, (SUBTREE, p1, right), (MAIN, p2, h), duplication, 1)
+            compose(duplication_loss_cost + recon.loss_cost, (SUBTREE, p1, left), (SUBTREE, p2, left), duplication, 2)
+            compose(duplication_loss_cost + recon.loss_cost, (SUBTREE, p1, right), (SUBTREE, p2, right),
+                    duplication, 2)
+        else:
+            compose(recon.duplication_cost, (MAIN, p1, h), (MAIN, p2, h), NestedSolution.DUPLICATION, 0)
+
+        for receiver in recon.get_allowed_transfers(host):
+            r = receiver.index
+            compose(recon.transfer_cost, (MAIN, p1, r), (SUBTREE, p2, h), NestedSolution.HOST_SWITCH, 0)
+            compose(recon.transfer_cost, (SUBTREE, p1, h), (MAIN, p2, r), NestedSolution.HOST_SWITCH, 0)
+        return edges
+
+    def leaf_edges(self, kind, parasite, host):
+        leaf_host = self.recon.leaf_map[parasite]
+        association = Association(parasite, leaf_host)
+        if host.index == leaf_host.index:
+            if kind == MAIN:
+                return [(LEAF, 0, (), (association, 0))]
+            return [(SAME, 0, ((MAIN, parasite.index, host.index),), None)]
+        if kind == MAIN:
+            return []
+        distance, ancestor = 1, leaf_host.parent
+        while ancestor is not None and ancestor.index != host.index:
+            ancestor = ancestor.parent
+            distance += 1
+        if ancestor is None:
+            return []
+        return [(LEAF, self.recon.loss_cost * distance, (), (association, distance))]
+
+    def solution(self, cell, rank):
+        """
+        The solution of a derivation, the subsolutions shared by several derivations are built once
+        """
+        key = cell, rank
+        if key in self.solutions:
+            return self.solutions[key]
+        return trampoline(self.solution_(cell, rank))
+
+    def solution_(self, cell, rank):
+        """The recursive calls are yielded, see trampoline"""
+        key = cell, rank
+        if key in self.solutions:
+            return self.solutions[key]
+        _, _, edge_index, ranks = yield self.derivation_(cell, rank)
+        kind, new_cost, tails, payload = self.edges[cell][edge_index]
+        if kind == COMPOSE:
+            association, event, num_losses = payload
+            first = yield self.solution_(tails[0], ranks[0])
+            second = yield self.solution_(tails[1], ranks[1])
+            solution = self.solution_generator.cartesian(new_cost, first, second, association, event, num_losses)
+        elif kind == SAME:
+            solution = yield self.solution_(tails[0], ranks[0])
+        elif kind == LOSS:
+            solution = self.solution_generator.add_loss(new_cost, (yield self.solution_(tails[0], ranks[0])))
+        else:
+            association, distance = payload
+            solution = self.solution_generator.from_leaf_association(association, self.recon.loss_cost, distance)
+        self.solutions[key] = solution
+        return solution
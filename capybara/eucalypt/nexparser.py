@@ -1,54 +1,70 @@
+import re
 from capybara.eucalypt.tree import TreeNode, Tree
 
 _OPEN_BRACKET = '('
 _CLOSED_BRACKET = ')'
 _CHILD_SEPARATOR = ','
+_NEWICK_TOKEN = re.compile(r'[(),]|[^(),][^,)]*')  # a label runs up to the next separator or closing bracket
+
+_COMMENT = re.compile(r'\[[^\]]*\]|^[ \t]*#[^\n]*', re.MULTILINE)
+_BLOCK = re.compile(r'\bbegin\s+(\w+)\s*;(.*?)(?:^|;)\s*end(?:block)?\s*;', re.IGNORECASE | re.DOTALL | re.MULTILINE)
+_RANGE = re.compile(r'\brange\b([^;]*)', re.IGNORECASE)
+_HOST_BLOCKS = ('host',)
+_SYMBIONT_BLOCKS = ('parasite', 'symbiont')
 
 
 def tree_from_newick(newick, label_prefix):
-    key, cursor, brackets = 0, 0, 0
-    tree = Tree(key)
+    """
+    The tree of a Newick string without the final semicolon, None if the brackets do not match
+
+    The nodes are numbered in the order of their opening in the string and listed in post-order as they close,
+    an unlabeled node is labeled by the prefix and its number
+    """
+    tree = Tree(0)
     root = tree.root
-    root.set_label(label_prefix + str(key))
-    key += 1
+    root.set_label(label_prefix + '0')
+    key, brackets = 1, 0
     current_node = root
+    nodes = []
 
-    while cursor < len(newick):
-        character = newick[cursor]
-        if character == _OPEN_BRACKET:
+    for token in _NEWICK_TOKEN.findall(newick):
+        if token == _OPEN_BRACKET:
+            if current_node.left_child is not None:
+                return None
             new_node = TreeNode(key)
-            new_node.set_label(label_prefix + str(key))
-            current_node.add_child(new_node)
+            new_node.label = label_prefix + new_node.label
+            current_node.left_child = new_node
+            new_node.parent = current_node
             current_node = new_node
             key += 1
-            cursor += 1
             brackets += 1
-        elif character == _CHILD_SEPARATOR:
-            new_node = TreeNode(key)
-            new_node.set_label(label_prefix + str(key))
-            if current_node.parent.has_left_child() and current_node.parent.has_right_child():
+        elif token == _CHILD_SEPARATOR:
+            parent = current_node.parent
+            if parent is None:
+                return None
+            if parent.right_child is not None:
                 raise NexusFileParserException('A non-leaf tree node must have exactly two children.')
-            current_node.parent.add_child(new_node)
+            nodes.append(current_node)
+            new_node = TreeNode(key)
+            new_node.label = label_prefix + new_node.label
+            parent.right_child = new_node
+            new_node.parent = parent
             current_node = new_node
             key += 1
-            cursor += 1
-        elif character == _CLOSED_BRACKET:
-            current_node = current_node.parent
-            cursor += 1
+        elif token == _CLOSED_BRACKET:
             brackets -= 1
             if brackets < 0:
                 return None
+            nodes.append(current_node)
+            current_node = current_node.parent
         else:
-            label = [character]
-            cursor += 1
-            while cursor < len(newick) and newick[cursor] not in (_CHILD_SEPARATOR, _CLOSED_BRACKET):
-                label.append(newick[cursor])
-                cursor += 1
-            label = ''.join(label).strip()
-            current_node.set_label(label)
-
-    # construct the post-order
-    tree.linearize()
+            current_node.label = token.strip()
+
+    while current_node is not None:  # the nodes still open at the end of the string
+        nodes.append(current_node)
+        current_node = current_node.parent
+    tree.nodes = nodes
+    tree.set_indices()
     return tree
 
 
@@ -59,63 +75,92 @@ class NexusFileParserException(Exception):
 
 
 class NexusParser:
+    """
+    Reader of Nexus files holding a host tree, symbiont trees and distributions
+
+    The file is split into blocks by regular expressions, each tree is read by tree_from_newick.
+    read keeps the first problem of the file, problems generates all of them
+    """
     def __init__(self, file):
         self.reader = file
         self.host_tree = None
         self.parasite_tree = None
         self.leaf_map = {}
 
-    @staticmethod
-    def is_comment_line(line):
-        return line[0] == '[' or line[0] == '#'
-
     def read(self):
-        line = self.reader.readline()
-        while line:
-            # remove leading and trailing whitespaces, compress inner whitespaces
-            line = ''.join(line.strip()).lower()
-            # catch valid file starting line
-            if 'begin parasite' in line or 'begin host' in line or 'begin symbiont' in line:
-                self.parse_standard_nexus(line)
-                break
-            elif 'begin trees' in line:
-                raise NexusFileParserException('This file format is not supported.')
-            # skip invalid and empty lines
-            line = self.reader.readline()
-        if not self.host_tree:
-            raise NexusFileParserException('Could not read host tree from Nexux file.')
-        if not self.parasite_tree:
-            raise NexusFileParserException('Could not read symbiont tree from Nexux file.')
-        if not self.leaf_map:
-            raise NexusFileParserException('Unexpected end of file while searching for DISTRIBUTION section.')
+        self.parasite_tree, self.host_tree, self.leaf_map = next(self.problems())
+
+    def problems(self):
+        """
+        Generate the (symbiont tree, host tree, leaf map) of each problem of the file
 
-    def parse_standard_nexus(self, first_line):
-        # first construct the two trees
-        string_host_tree, string_parasite_tree = self.read_trees(first_line)
-        if not string_host_tree:
+        The host tree is shared by all the problems. The symbiont trees and the distributions are paired in order,
+        a single symbiont tree goes with every distribution and a single distribution with every symbiont tree
+        """
+        host_strings, parasite_strings, distributions = self.read_blocks()
+        if not host_strings:
             raise NexusFileParserException('Could not read host tree from Nexus file.')
-        if not string_parasite_tree:
+        if len(host_strings) > 1:
+            raise NexusFileParserException('A Nexus file can only hold one host tree.')
+        if not parasite_strings:
             raise NexusFileParserException('Could not read symbiont tree from Nexus file.')
-        distribution = self.read_distribution()
-        if not distribution:
+        if not distributions:
             raise NexusFileParserException('Unexpected end of file while searching for DISTRIBUTION section.')
+        num_problems = max(len(parasite_strings), len(distributions))
+        if min(len(parasite_strings), len(distributions)) not in (1, num_problems):
+            raise NexusFileParserException('The numbers of symbiont trees and of distributions do not match.')
+
+        host_tree = NexusParser.parse_tree(host_strings[0], '!H', 'Host')
+        parasite_tree = None
+        for index in range(num_problems):
+            if parasite_tree is None or len(parasite_strings) > 1:
+                parasite_tree = NexusParser.parse_tree(parasite_strings[min(index, len(parasite_strings) - 1)],
+                                                       '!P', 'Symbiont')
+            leaf_label_map = NexusParser.parse_distribution(distributions[min(index, len(distributions) - 1)])
+            yield parasite_tree, host_tree, NexusParser.build_leaf_map(host_tree, parasite_tree, leaf_label_map)
+
+    def read_blocks(self):
+        """
+        The host tree strings, the symbiont tree strings and the distribution strings, in the order of the file
+        """
+        text = _COMMENT.sub('', self.reader.read())
+        host_strings, parasite_strings, distributions = [], [], []
+        for match in _BLOCK.finditer(text):
+            kind, body = match.group(1).lower(), match.group(2)
+            if kind == 'trees':
+                raise NexusFileParserException('This file format is not supported.')
+            if kind in _HOST_BLOCKS or kind in _SYMBIONT_BLOCKS:
+                strings = host_strings if kind in _HOST_BLOCKS else parasite_strings
+                for statement in body.split(';'):
+                    if '=' in statement:
+                        strings.append(''.join(statement.split('=', 1)[1].split()))
+            elif kind == 'distribution':
+                distribution = _RANGE.search(body)
+                if distribution:
+                    distributions.append(distribution.group(1))
+        return host_strings, parasite_strings, distributions
 
-        self.host_tree = tree_from_newick(string_host_tree, '!H')
-        if not self.host_tree:
-            raise NexusFileParserException('\n'.join(['Malformed tree string', string_host_tree, '']))
-        self.parasite_tree = tree_from_newick(string_parasite_tree, '!P')
-        if not self.parasite_tree:
-            raise NexusFileParserException('\n'.join(['Malformed tree string', string_parasite_tree, '']))
-        if not self.host_tree.is_full():
-            raise NexusFileParserException('Host tree is not full')
-        if not self.parasite_tree.is_full():
-            raise NexusFileParserException('Symbiont tree is not full')
-
-        # then construct the leaf map
+    @staticmethod
+    def parse_tree(newick, label_prefix, name):
+        if not newick:
+            raise NexusFileParserException(f'Could not read {name.lower()} tree from Nexus file.')
+        tree = tree_from_newick(newick, label_prefix)
+        if not tree:
+            raise NexusFileParserException('\n'.join(['Malformed tree string', newick, '']))
+        if not tree.is_full():
+            raise NexusFileParserException(f'{name} tree is not full')
+        return tree
+
+    @staticmethod
+    def parse_distribution(distribution):
         leaf_label_map = {}
-        distribution = distribution.replace(';', '').strip().split(',')
-        for string_pair in distribution:
-            parasite_label, host_label = string_pair.split(':')
+        for string_pair in distribution.split(','):
+            if not string_pair.strip():
+                continue
+            try:
+                parasite_label, host_label = string_pair.split(':')
+            except ValueError:
+                raise NexusFileParserException(f'Malformed distribution entry {string_pair.strip()}.')
             parasite_label = parasite_label.strip()
             host_label = host_label.strip()
 
@@ -123,90 +168,20 @@ class NexusParser:
                 if leaf_label_map[parasite_label] != host_label:
                     raise NexusFileParserException('A symbiont label cannot be associated to two different host labels.')
             leaf_label_map[parasite_label] = host_label
-        return_code = self.build_leaf_map(leaf_label_map)
-        if return_code == 1:
-            raise NexusFileParserException('The distribution is not leaf-to-leaf.')
-        elif return_code == 2:
-            raise NexusFileParserException('Not every leaf node in symbiont tree is mapped.')
-
-    def read_trees(self, first_line):
-        string_host_tree, string_parasite_tree = '', ''
-        if 'begin parasite' in first_line or 'begin symbiont' in first_line:
-            # read parasite first
-            string_parasite_tree = self.read_tree_string()
-            line = self.reader.readline()
-            while line:
-                line = ''.join(line.strip())
-                if 'begin host' in line.lower():
-                    string_host_tree = self.read_tree_string()
-                    break
-                line = self.reader.readline()
-        else:
-            # read host first
-            string_host_tree = self.read_tree_string()
-            line = self.reader.readline()
-            while line:
-                line = ''.join(line.strip()).lower()
-                if 'begin parasite' in line or 'begin symbiont' in line:
-                    string_parasite_tree = self.read_tree_string()
-                    break
-                line = self.reader.readline()
-        return string_host_tree, string_parasite_tree
-
-    def read_tree_string(self):
-        try:
-            line = self.reader.readline()
-            while line:
-                line = line.rstrip()
-                if not NexusParser.is_comment_line(line) and '=' in line:  # found the tree string
-                    break
-                line = self.reader.readline()
-            if not line:
-                return ''
-            line = ''.join(line.strip())
-            tree_string = line.split('=')[1]
-            return tree_string.replace(';', '').replace(' ', '')
-        except (ValueError, IndexError):
-            return ''
-
-    def read_distribution(self):
-        line = self.reader.readline()
-        while line:
-            line = ''.join(line.strip()).lower()
-            if 'range' in line:
-                break
-            line = self.reader.readline()
-        if not line:
-            return ''
-        distribution = ''
-        line = self.reader.readline()
-        while line:
-            line = ''.join(line.strip())
-            if 'end;' in line.lower() or 'endblock;' in line.lower():
-                break
-            if NexusParser.is_comment_line(line):
-                continue
-            distribution += line
-            line = self.reader.readline()
-        if not line:
-            return ''
-        return distribution
-
-    def build_leaf_map(self, leaf_label_map):
-        host_label_map = {}
-        for host_node in self.host_tree:
-            if host_node.is_leaf():
-                host_label_map[host_node.label] = host_node
-        for parasite_node in self.parasite_tree:
+        return leaf_label_map
+
+    @staticmethod
+    def build_leaf_map(host_tree, parasite_tree, leaf_label_map):
+        host_label_map = {host_node.label: host_node for host_node in host_tree if host_node.is_leaf()}
+        leaf_map = {}
+        for parasite_node in parasite_tree:
             if parasite_node.is_leaf():
                 try:
                     host_label = leaf_label_map[parasite_node.label]
                 except KeyError:
-                    return 2
+                    raise NexusFileParserException('Not every leaf node in symbiont tree is mapped.')
                 try:
-                    self.leaf_map[parasite_node] = host_label_map[host_label]
+                    leaf_map[parasite_node] = host_label_map[host_label]
                 except KeyError:
-                    return 1
-        return 0
-
-
+                    raise NexusFileParserException('The distribution is not leaf-to-leaf.')
+        return leaf_map
@@ -0,0 +1,80 @@
+import multiprocessing
+from array import array
+
+
+_cost_matrices = None  # read-only copy of the host-tree data in each worker process
+# Smallest level (rows times hosts) sent to the pool. Computing a row reads a few candidates per cell
+# while sending it copies the cell once, but each level costs a round trip to the pool and the pool
+# itself takes a process start, so a level below this is filled faster in the main process
+MIN_POOL_CELLS = 50000
+
+
+def parasite_levels(parasite_tree):
+    """
+    Group the symbiont nodes by height, the rows of a level only depend on the rows of the lower levels
+    """
+    height = [0] * parasite_tree.size()
+    levels = [[]]
+    for parasite in parasite_tree:
+        if not parasite.is_leaf():
+            height[parasite.index] = 1 + max(height[parasite.left_child.index], height[parasite.right_child.index])
+            if height[parasite.index] == len(levels):
+                levels.append([])
+        levels[height[parasite.index]].append(parasite)
+    return levels
+
+
+def pack(row):
+    """
+    Compact copy of the rows of one symbiont for sending them between processes
+    """
+    main, subtree, receivers = row
+    if receivers is not None:
+        receivers = array('d', receivers[0]), array('d', receivers[1])
+    return array('d', main), array('d', subtree), receivers
+
+
+def unpack(row):
+    main, subtree, receivers = row
+    if receivers is not None:
+        receivers = receivers[0].tolist(), receivers[1].tolist()
+    return main.tolist(), subtree.tolist(), receivers
+
+
+def init_worker(cost_matrices):
+    global _cost_matrices
+    _cost_matrices = cost_matrices
+
+
+def fill_internal_row(children):
+    first, second = children
+    return pack(_cost_matrices.internal_row(unpack(first), unpack(second)))
+
+
+def fill_by_levels(cost_matrices, processes):
+    """
+    Fill the cost-only matrices level by level, the rows of the large levels are spread over a process pool
+    in one chunk per process, the small levels are filled in the main process and start no pool
+    """
+    levels = parasite_levels(cost_matrices.parasite_tree)
+    width = cost_matrices.host_tree.size()
+    for parasite in levels[0]:
+        cost_matrices.fill_row(parasite)
+    large = [len(level) > 1 and len(level) * width >= MIN_POOL_CELLS for level in levels[1:]]
+    if not any(large):
+        for level in levels[1:]:
+            for parasite in level:
+                cost_matrices.fill_row(parasite)
+        return
+
+    with multiprocessing.Pool(processes, initializer=init_worker, initargs=(cost_matrices,)) as pool:
+        for level, is_large in zip(levels[1:], large):
+            if not is_large:
+                for parasite in level:
+                    cost_matrices.fill_row(parasite)
+                continue
+            tasks = [(pack(cost_matrices.get_row(parasite.left_child.index)),
+                      pack(cost_matrices.get_row(parasite.right_child.index))) for parasite in level]
+            rows = pool.map(fill_internal_row, tasks, chunksize=-(-len(tasks) // processes))
+            for parasite, row in zip(level, rows):
+                cost_matrices.store_row(parasite.index, unpack(row))
@@ -1,4 +1,8 @@
-from capybara.eucalypt.solution import Association, NestedSolution, SolutionGenerator, BestKSolutionGenerator
+from capybara.eucalypt.solution import Association, NestedSolution, SolutionGenerator
+from capybara.eucalypt.cost import CostMatrices, INF
+from capybara.eucalypt.sparse import sparse_matrix
+from capybara.eucalypt.kbest import LazyBestK
+from capybara.eucalypt.transfer import get_receiver_index, get_distance_index
 from capybara.equivalence.event_vector import SolutionGeneratorEventVectorCounter, SolutionGeneratorEventVector
 
 
@@ -6,6 +10,11 @@ class Reconciliator:
     """
     General class for updating the dynamic programming matrices
     """
+    # fill a cost-only pass first, then build solutions only for the optimal candidates
+    cost_first = True
+    # after the cost-only pass, skip the cells that no optimal solution uses
+    prune = True
+
     def __init__(self, host_tree, parasite_tree, leaf_map,
                  cospeciation_cost, duplication_cost, transfer_cost, loss_cost, distance_threshold):
         self.solution_generator = None
@@ -19,90 +28,45 @@ class Reconciliator:
         self.loss_cost = loss_cost
         self.distance_threshold = distance_threshold
 
-        self.main_matrix, self.subtree_matrix, self.allowed_transfers = None, None, None
+        self.main_matrix, self.subtree_matrix = None, None
+        self.receiver_index, self.distance_index = None, None
+        self.cost_matrices = None
+        self.processes = 1  # number of processes for the cost-only pass
 
     def init_matrices(self):
-        self.main_matrix = [[self.solution_generator.empty_solution() for _ in range(self.host_tree.size())]
-                            for _ in range(self.parasite_tree.size())]
-        self.subtree_matrix = [[self.solution_generator.empty_solution() for _ in range(self.host_tree.size())]
-                               for _ in range(self.parasite_tree.size())]
+        empty = self.solution_generator.empty_solution()
+        self.main_matrix = sparse_matrix(self.parasite_tree.size(), self.host_tree.size(), empty)
+        self.subtree_matrix = sparse_matrix(self.parasite_tree.size(), self.host_tree.size(), empty)
 
         self.initialize_leaf_costs()
-        self.allowed_transfers = [None] * self.host_tree.size()
-        self.allowed_transfers[self.host_tree.root.index] = set()
+        if self.distance_threshold < float('Inf'):
+            self.distance_index = get_distance_index(self.host_tree, int(self.distance_threshold))
+        else:
+            # every incomparable host is allowed, read them from the postorder intervals
+            self.receiver_index = get_receiver_index(self.host_tree)
 
     def initialize_leaf_costs(self):
         for parasite, host in self.leaf_map.items():
-            row, column = parasite.index, host.index
-            self.main_matrix[row][column] = self.solution_generator.from_leaf_association(Association(parasite, host))
-            self.subtree_matrix[row][column] = self.main_matrix[row][column]
-
-            distance = 1
-            ancestor = host.parent
-            while ancestor:
-                ancestor_index = ancestor.index
-                self.subtree_matrix[row][ancestor_index] = \
-                    self.solution_generator.from_leaf_association(Association(parasite, host), self.loss_cost, distance)
-                ancestor = ancestor.parent
-                distance += 1
+            self.initialize_leaf_row(parasite, host)
 
-    def get_allowed_transfers(self, host):
-        if self.allowed_transfers[host.index] is not None:
-            return self.allowed_transfers[host.index]
-
-        result = []
-        target = host.get_sibling()
+    def initialize_leaf_row(self, parasite, host):
+        row, column = parasite.index, host.index
+        self.main_matrix[row][column] = self.solution_generator.from_leaf_association(Association(parasite, host))
+        self.subtree_matrix[row][column] = self.main_matrix[row][column]
+
+        distance = 1
+        ancestor = host.parent
+        while ancestor:
+            ancestor_index = ancestor.index
+            self.subtree_matrix[row][ancestor_index] = \
+                self.solution_generator.from_leaf_association(Association(parasite, host), self.loss_cost, distance)
+            ancestor = ancestor.parent
+            distance += 1
 
-        if self.distance_threshold < float('Inf'):
-            distance = 2
-
-            while distance <= self.distance_threshold:
-                previous, next_ = None, None
-                while target != next_:
-                    if previous is None:
-                        next_ = target
-                        while not next_.is_leaf() and distance < self.distance_threshold:
-                            next_ = next_.left_child
-                            distance += 1
-                    else:
-                        next_ = previous.parent
-                        distance -= 1
-                        if previous == next_.left_child and distance <= self.distance_threshold:
-                            next_ = next_.right_child
-                            distance += 1
-                            while not next_.is_leaf() and distance < self.distance_threshold:
-                                next_ = next_.left_child
-                                distance += 1
-                    previous = next_
-                    result.append(next_)
-
-                if target.parent.is_root():
-                    break
-                target = target.parent.get_sibling()
-                distance += 1
-        else:
-            while True:
-                previous, next_ = None, None
-                while target != next_:
-                    if previous is None:
-                        next_ = target
-                        while not next_.is_leaf():
-                            next_ = next_.left_child
-                    else:
-                        next_ = previous.parent
-                        if previous == next_.left_child:
-                            next_ = next_.right_child
-                            while not next_.is_leaf():
-                                next_ = next_.left_child
-                    previous = next_
-                    result.append(next_)
-
-                if target.parent.is_root():
-                    break
-                target = target.parent.get_sibling()
-
-        self.allowed_transfers[host.index] = set(result)
-        return result
+    def get_allowed_transfers(self, host):
+        if self.receiver_index is not None:
+            return self.receiver_index.allowed_transfers(host)
+        return self.distance_index.allowed_transfers(host, self.distance_threshold)
 
     def run(self):
         self.fill_matrices()
@@ -110,46 +74,91 @@ class Reconciliator:
 
     def finishing_up(self):
         parasite_root_row = self.main_matrix[self.parasite_tree.root.index]
-        optimal_solutions = self.solution_generator.best_solution(parasite_root_row)
+        optimal_solutions = self.solution_generator.best_solution(list(parasite_root_row))
         return optimal_solutions
 
+    def fill_cost_matrices(self):
+        self.cost_matrices = CostMatrices(self.host_tree, self.parasite_tree, self.leaf_map,
+                                          self.cospeciation_cost, self.duplication_cost,
+                                          self.transfer_cost, self.loss_cost, self.receiver_index,
+                                          self.get_allowed_transfers)
+        self.cost_matrices.fill(self.processes)
+
     def fill_matrices(self):
+        if self.cost_first:
+            self.fill_cost_matrices()
+            if self.prune:
+                self.cost_matrices.mark_optimal_cells()
         for parasite in self.parasite_tree:
             if parasite.is_leaf():
                 continue
             for host in self.host_tree:
                 self.fill_matrices_at(parasite, host)
 
+    def optimal_costs(self, row, column):
+        """
+        Optimal costs of the main and the subtree cells, or None if there was no cost-only pass,
+        a cell that no optimal solution uses is given an infinite cost when pruning
+        """
+        if self.cost_matrices is None:
+            return None, None
+        target, subtree_target = self.cost_matrices.main[row][column], self.cost_matrices.subtree[row][column]
+        if self.cost_matrices.main_used is not None:
+            if not self.cost_matrices.main_used[row][column]:
+                target = INF
+            if not self.cost_matrices.subtree_used[row][column]:
+                subtree_target = INF
+        return target, subtree_target
+
+    def candidate(self, target, new_cost, first, second, association, event, num_losses):
+        """
+        Compose a solution, unless its cost is known to miss the optimal cost of the cell
+        """
+        if target is not None and new_cost + first.cost + second.cost != target:
+            return None
+        return self.solution_generator.cartesian(new_cost, first, second, association, event, num_losses)
+
+    def best_candidate(self, solutions):
+        solutions = [solution for solution in solutions if solution is not None]
+        if not solutions:
+            return self.solution_generator.empty_solution()
+        return self.solution_generator.best_solution(solutions)
+
     def fill_matrices_at(self, parasite, host):
-        association = Association(parasite, host)
         row, column = parasite.index, host.index
-        if host.is_leaf():
-            duplication_sol = self.duplication_leaf_solution(parasite, host, association)
-            transfer_sol = self.transfer_solution(parasite, host, association)
-            best_solution = self.solution_generator.best_solution([duplication_sol, transfer_sol])
-
-            self.main_matrix[row][column] = best_solution
-            self.subtree_matrix[row][column] = best_solution
+        target, subtree_target = self.optimal_costs(row, column)
+        if target == INF and subtree_target == INF:
+            return
+        association = Association(parasite, host)
+        if target == INF:
+            best_solution = self.solution_generator.empty_solution()
+        elif host.is_leaf():
+            duplication_sol = self.duplication_leaf_solution(parasite, host, association, target)
+            transfer_sol = self.transfer_solution(parasite, host, association, target)
+            best_solution = self.best_candidate([duplication_sol, transfer_sol])
         else:
-            duplication_sol = self.duplication_solution(parasite, host, association)
-            transfer_sol = self.transfer_solution(parasite, host, association)
-            cospeciation_sol = self.cospeciation_solution(parasite, host, association)
-            best_solution = self.solution_generator.best_solution([cospeciation_sol, duplication_sol, transfer_sol])
-
-            self.main_matrix[row][column] = best_solution
-
-            loss_solution_left, loss_solution_right = self.subtree_loss_solutions(parasite, host)
-            best_subtree_solution = self.solution_generator.best_solution([best_solution,
-                                                                           loss_solution_left, loss_solution_right])
-            self.subtree_matrix[row][column] = best_subtree_solution
+            duplication_sol = self.duplication_solution(parasite, host, association, target)
+            transfer_sol = self.transfer_solution(parasite, host, association, target)
+            cospeciation_sol = self.cospeciation_solution(parasite, host, association, target)
+            best_solution = self.best_candidate([cospeciation_sol, duplication_sol, transfer_sol])
 
-    def duplication_leaf_solution(self, parasite, host, association):
+        self.main_matrix[row][column] = best_solution
+        if host.is_leaf():
+            self.subtree_matrix[row][column] = best_solution
+        elif subtree_target != INF:
+            if subtree_target is not None and best_solution.cost != subtree_target:
+                best_solution = None
+            loss_solution_left, loss_solution_right = self.subtree_loss_solutions(parasite, host, subtree_target)
+            self.subtree_matrix[row][column] = self.best_candidate([best_solution,
+                                                                    loss_solution_left, loss_solution_right])
+
+    def duplication_leaf_solution(self, parasite, host, association, target=None):
         first = self.main_matrix[parasite.left_child.index][host.index]
         second = self.main_matrix[parasite.right_child.index][host.index]
-        return self.solution_generator.cartesian(self.duplication_cost, first, second, association,
-                                                 NestedSolution.DUPLICATION, 0)
+        return self.candidate(target, self.duplication_cost, first, second, association,
+                              NestedSolution.DUPLICATION, 0)
 
-    def duplication_solution(self, parasite, host, association):
+    def duplication_solution(self, parasite, host, association, target=None):
         first1 = self.main_matrix[parasite.left_child.index][host.index]
         first2 = self.main_matrix[parasite.left_child.index][host.index]
         first3 = self.main_matrix[parasite.left_child.index][host.index]
@@ -166,53 +175,79 @@ class Reconciliator:
         second6 = self.subtree_matrix[parasite.right_child.index][host.left_child.index]
         second7 = self.subtree_matrix[parasite.right_child.index][host.right_child.index]
 
-        solution1 = self.solution_generator.cartesian(self.duplication_cost, first1, second1, association,
-                                                      NestedSolution.DUPLICATION, 0)
-        solution2 = self.solution_generator.cartesian(self.duplication_cost + self.loss_cost, first2, second2,
-                                                      association, NestedSolution.DUPLICATION, 1)
-        solution3 = self.solution_generator.cartesian(self.duplication_cost + self.loss_cost, first3, second3,
-                                                      association, NestedSolution.DUPLICATION, 1)
-        solution4 = self.solution_generator.cartesian(self.duplication_cost + self.loss_cost, second4, first4,
-                                                      association, NestedSolution.DUPLICATION, 1)
-        solution5 = self.solution_generator.cartesian(self.duplication_cost + self.loss_cost, second5, first5,
-                                                      association, NestedSolution.DUPLICATION, 1)
-        solution6 = self.solution_generator.cartesian(self.duplication_cost + self.loss_cost + self.loss_cost,
-                                                      first6, second6, association, NestedSolution.DUPLICATION, 2)
-        solution7 = self.solution_generator.cartesian(self.duplication_cost + self.loss_cost + self.loss_cost,
-                                                      first7, second7, association, NestedSolution.DUPLICATION, 2)
-        return self.solution_generator.best_solution([solution1, solution2, solution3, solution4,
-                                                      solution5, solution6, solution7])
-
-    def transfer_solution(self, parasite, host, association):
-        best_solution = self.solution_generator.empty_solution()
+        solution1 = self.candidate(target, self.duplication_cost, first1, second1, association,
+                                   NestedSolution.DUPLICATION, 0)
+        solution2 = self.candidate(target, self.duplication_cost + self.loss_cost, first2, second2,
+                                   association, NestedSolution.DUPLICATION, 1)
+        solution3 = self.candidate(target, self.duplication_cost + self.loss_cost, first3, second3,
+                                   association, NestedSolution.DUPLICATION, 1)
+        solution4 = self.candidate(target, self.duplication_cost + self.loss_cost, second4, first4,
+                                   association, NestedSolution.DUPLICATION, 1)
+        solution5 = self.candidate(target, self.duplication_cost + self.loss_cost, second5, first5,
+                                   association, NestedSolution.DUPLICATION, 1)
+        solution6 = self.candidate(target, self.duplication_cost + self.loss_cost + self.loss_cost,
+                                   first6, second6, association, NestedSolution.DUPLICATION, 2)
+        solution7 = self.candidate(target, self.duplication_cost + self.loss_cost + self.loss_cost,
+                                   first7, second7, association, NestedSolution.DUPLICATION, 2)
+        return self.best_candidate([solution1, solution2, solution3, solution4,
+                                    solution5, solution6, solution7])
+
+    def transfer_solution(self, parasite, host, association, target=None):
+        if target is not None and self.receiver_index is not None:
+            return self.tied_transfer_solution(parasite, host, association, target)
+        candidates = []
+        first_right = self.subtree_matrix[parasite.right_child.index][host.index]
+        second_left = self.subtree_matrix[parasite.left_child.index][host.index]
         for transfer_host in self.get_allowed_transfers(host):
             first_left = self.main_matrix[parasite.left_child.index][transfer_host.index]
-            first_right = self.subtree_matrix[parasite.right_child.index][host.index]
-            first = self.solution_generator.cartesian(self.transfer_cost, first_left, first_right, association,
-                                                      NestedSolution.HOST_SWITCH, 0)
-            second_left = self.subtree_matrix[parasite.left_child.index][host.index]
+            candidates.append(self.candidate(target, self.transfer_cost, first_left, first_right, association,
+                                             NestedSolution.HOST_SWITCH, 0))
             second_right = self.main_matrix[parasite.right_child.index][transfer_host.index]
-            second = self.solution_generator.cartesian(self.transfer_cost, second_left, second_right, association,
-                                                       NestedSolution.HOST_SWITCH, 0)
-            best_solution = self.solution_generator.best_solution([best_solution, first, second])
-        return best_solution
-
-    def cospeciation_solution(self, parasite, host, association):
+            candidates.append(self.candidate(target, self.transfer_cost, second_left, second_right, association,
+                                             NestedSolution.HOST_SWITCH, 0))
+        return self.best_candidate(candidates)
+
+    def tied_transfer_solution(self, parasite, host, association, target):
+        """
+        Same as transfer_solution, but only visit the receivers reaching the optimal cost of the cell
+        """
+        p1, p2 = parasite.left_child.index, parasite.right_child.index
+        first_right = self.subtree_matrix[p2][host.index]
+        second_left = self.subtree_matrix[p1][host.index]
+        rows = [self.cost_matrices.receiver_row(p1, target - self.transfer_cost - first_right.cost),
+                self.cost_matrices.receiver_row(p2, target - self.transfer_cost - second_left.cost)]
+
+        candidates = []
+        for receiver, (first, second) in self.receiver_index.receivers(host.index, rows):
+            if first:
+                candidates.append(self.candidate(target, self.transfer_cost, self.main_matrix[p1][receiver],
+                                                 first_right, association, NestedSolution.HOST_SWITCH, 0))
+            if second:
+                candidates.append(self.candidate(target, self.transfer_cost, second_left,
+                                                 self.main_matrix[p2][receiver], association,
+                                                 NestedSolution.HOST_SWITCH, 0))
+        return self.best_candidate(candidates)
+
+    def cospeciation_solution(self, parasite, host, association, target=None):
         first_left = self.subtree_matrix[parasite.left_child.index][host.left_child.index]
         first_right = self.subtree_matrix[parasite.right_child.index][host.right_child.index]
-        first = self.solution_generator.cartesian(self.cospeciation_cost, first_left, first_right,
-                                                  association, NestedSolution.COSPECIATION, 0)
+        first = self.candidate(target, self.cospeciation_cost, first_left, first_right,
+                               association, NestedSolution.COSPECIATION, 0)
         second_left = self.subtree_matrix[parasite.left_child.index][host.right_child.index]
         second_right = self.subtree_matrix[parasite.right_child.index][host.left_child.index]
-        second = self.solution_generator.cartesian(self.cospeciation_cost, second_left, second_right,
-                                                   association, NestedSolution.COSPECIATION, 0)
-        return self.solution_generator.best_solution([first, second])
-
-    def subtree_loss_solutions(self, parasite, host):
-        return self.solution_generator.add_loss(self.loss_cost,
-                                                self.subtree_matrix[parasite.index][host.left_child.index]), \
-               self.solution_generator.add_loss(self.loss_cost,
-                                                self.subtree_matrix[parasite.index][host.right_child.index])
+        second = self.candidate(target, self.cospeciation_cost, second_left, second_right,
+                                association, NestedSolution.COSPECIATION, 0)
+        return self.best_candidate([first, second])
+
+    def subtree_loss_solutions(self, parasite, host, target=None):
+        solutions = []
+        for child in (host.left_child, host.right_child):
+            child_solution = self.subtree_matrix[parasite.index][child.index]
+            if target is not None and child_solution.cost + self.loss_cost != target:
+                solutions.append(None)
+            else:
+                solutions.append(self.solution_generator.add_loss(self.loss_cost, child_solution))
+        return solutions
 
 
 class ReconciliatorCounter(Reconciliator):
@@ -252,22 +287,29 @@ class ReconciliatorEnumerator(Reconciliator):
 
 
 class ReconciliatorBestKEnumerator(Reconciliator):
+    """
+    The best K solutions, optimal or not, generated lazily from the cost-only matrices
+    """
     def __init__(self, host_tree, parasite_tree, leaf_map,
                  cospeciation_cost, duplication_cost, transfer_cost, loss_cost, distance_threshold, k):
         super().__init__(host_tree, parasite_tree, leaf_map,
                          cospeciation_cost, duplication_cost, transfer_cost, loss_cost, distance_threshold)
 
-        self.solution_generator = BestKSolutionGenerator(k)
+        self.k = k
+        self.solution_generator = SolutionGenerator(False)
         self.init_matrices()
         self.cost_summary = {}  # the number of solutions for each cost value
 
     def run(self):
-        self.fill_matrices()
-        root = self.finishing_up()
-        for solution in root.children:
+        self.fill_cost_matrices()
+        solutions = LazyBestK(self).best(self.k)
+        for solution in solutions:
             if solution.cost not in self.cost_summary:
                 self.cost_summary[solution.cost] = 1
             else:
                 self.cost_summary[solution.cost] += 1
-        return root
-
+        if not solutions:
+            return self.solution_generator.empty_solution()
+        if len(solutions) == 1:
+            return solutions[0]
+        return NestedSolution(solutions[0].cost, None, NestedSolution.MULTIPLE, None, False, solutions)
@@ -1,26 +1,40 @@
-import heapq
+class Association:
+    """
+    A symbiont node mapped to a host node, identified by the integer key of the pair of post-order indices
 
+    The key is read from the current indices, an incremental edit renumbers the symbiont tree
+    """
+    __slots__ = 'parasite', 'host'
+    HOST_BITS = 32  # the host index takes the low bits of the key, the special class hosts have negative indices
 
-class Association:
     def __init__(self, parasite, host):
         self.parasite = parasite
         self.host = host
 
+    @property
+    def key(self):
+        return (self.parasite.index << Association.HOST_BITS) + self.host.index
+
     def __repr__(self):
         return self.parasite.label + '@' + self.host.label
 
     def __eq__(self, other):
         """Overrides the default implementation"""
         if isinstance(other, Association):
-            return self.parasite.label == other.parasite.label and self.host.label == other.host.label
+            return self.parasite.index == other.parasite.index and self.host.index == other.host.index
         return False
 
     def __hash__(self):
         """Overrides the default implementation"""
-        return hash(self.parasite.label + self.host.label)
+        return (self.parasite.index << Association.HOST_BITS) + self.host.index
 
 
 class NestedSolution:
+    """
+    Node of the solution graph, the slots keep millions of nodes small
+    """
+    __slots__ = ('cost', 'association', 'composition_type', 'event', 'accumulate',
+                 'left_grandchildren', 'right_grandchildren', 'children', 'num_subsolutions')
     SIMPLE, MULTIPLE, FINAL = 0, 1, 2
     COSPECIATION, DUPLICATION, HOST_SWITCH, LEAF = 0, 1, 2, 4
 
@@ -52,31 +66,63 @@ class NestedSolution:
 
 
 class SolutionGenerator:
+    """
+    Build the solution nodes, the leaf and loss nodes are shared when identical (hash-consing)
+
+    Identical nodes come from the leaf associations and the losses of cost 0, which repeat their child,
+    the compositions, the merges and the other losses of the reconciliation are all distinct.
+    The leaf table is keyed by the tree nodes, not by their post-order indices, since an incremental edit
+    renumbers the symbiont tree
+    """
     EMPTY = NestedSolution(float('Inf'), None, NestedSolution.FINAL,
                            NestedSolution.LEAF, True, [])
 
     def __init__(self, accumulate):
         self.accumulate = accumulate
+        self.nodes = {}
+        self.num_requested = 0  # number of shareable nodes asked for
+        self.num_shared = 0  # number of them answered by an existing node
+
+    def sharing_summary(self):
+        """Number of shareable nodes asked for, and number of them that were shared instead of created"""
+        return self.num_requested, self.num_shared
+
+    def leaf_node(self, association, cost):
+        """
+        The leaf node of an association with the given cost, created only once
+        """
+        self.num_requested += 1
+        key = id(association.parasite), id(association.host), cost  # the cached node keeps both tree nodes alive
+        node = self.nodes.get(key)
+        if node is not None:
+            self.num_shared += 1
+            return node
+        node = NestedSolution(cost, association, NestedSolution.FINAL, NestedSolution.LEAF, self.accumulate, [])
+        self.nodes[key] = node
+        return node
 
     def empty_solution(self):
         return SolutionGenerator.EMPTY
 
     def from_leaf_association(self, association, loss_cost=0, distance=0):
-        return NestedSolution(loss_cost * distance, association,
-                              NestedSolution.FINAL,
-                              NestedSolution.LEAF, self.accumulate, [])
+        return self.leaf_node(association, loss_cost * distance)
 
     def cartesian(self, new_cost, first, second, association, event, num_losses):
         if first.cost == float('Inf') or second.cost == float('Inf'):
             return self.empty_solution()
         cost = new_cost + first.cost + second.cost
-        return NestedSolution(cost, association, NestedSolution.SIMPLE, event, self.accumulate, [first, second])
+        return NestedSolution(cost, association, NestedSolution.SIMPLE, event, self.accumulate, (first, second))
 
     def add_loss(self, loss_cost, solution):
-        # something which was REALLY REALLY BADLY WRITTEN in the original code
-        return NestedSolution(solution.cost + loss_cost, solution.association,
-                              solution.composition_type, solution.event, self.accumulate,
-                              solution.children, solution.num_subsolutions)
+        """
+        The solution moved up by one loss, a constant-time wrapper sharing the children of the solution
+        """
+        if loss_cost == 0:  # identical to the solution itself
+            self.num_requested += 1
+            self.num_shared += 1
+            return solution
+        return NestedSolution(solution.cost + loss_cost, solution.association, solution.composition_type,
+                              solution.event, self.accumulate, solution.children, solution.num_subsolutions)
 
     def best_solution(self, solutions):
         """select the solutions with minimum cost"""
@@ -98,123 +144,3 @@ class SolutionGenerator:
             else:
                 children.append(solution)
         return NestedSolution(first.cost, None, NestedSolution.MULTIPLE, None, self.accumulate, children)
-
-
-class BestKSolutionGenerator(SolutionGenerator):
-    def __init__(self, k):
-        super().__init__(False)
-        self.k = k
-
-    def cartesian(self, new_cost, first, second, association, event, num_losses):
-        if first.cost == float('Inf') or second.cost == float('Inf'):
-            return self.empty_solution()
-
-        if first.composition_type != NestedSolution.MULTIPLE and second.composition_type != NestedSolution.MULTIPLE:
-            cost = new_cost + first.cost + second.cost
-            return NestedSolution(cost, association, NestedSolution.SIMPLE, event,
-                                  self.accumulate, [first, second])
-
-        children = []
-        if first.composition_type == NestedSolution.MULTIPLE and second.composition_type == NestedSolution.MULTIPLE:
-            pq = [(first.children[0].cost + second.children[j].cost, 0, j) for j in range(len(second.children))]
-            heapq.heapify(pq)
-
-            while len(pq) > 0:
-                v, i, j = heapq.heappop(pq)
-                children.append(self.cartesian(new_cost, first.children[i], second.children[j],
-                                               association, event, num_losses))
-                if len(children) == self.k:
-                    break
-                if i < len(first.children)-1:
-                    i += 1
-                    heapq.heappush(pq, (first.children[i].cost + second.children[j].cost, i, j))
-
-        elif first.composition_type == NestedSolution.MULTIPLE:
-            for first_child in first.children:
-                children.append(self.cartesian(new_cost, first_child, second, association, event, num_losses))
-        else:
-            for second_child in second.children:
-                children.append(self.cartesian(new_cost, first, second_child, association, event, num_losses))
-
-        if self.k == 1:
-            return children[0]
-        return NestedSolution(children[0].cost, None, NestedSolution.MULTIPLE, None, self.accumulate, children)
-
-    def best_solution(self, solutions):
-        """select the best k solutions"""
-        best = solutions[0]
-        for solution in solutions[1:]:
-            best = self.k_merge(best, solution)
-        return best
-
-    def k_merge(self, first, second):
-        if first.cost == float('Inf') and second.cost == float('Inf'):
-            return self.empty_solution()
-        elif first.cost == float('Inf'):
-            return second
-        elif second.cost == float('Inf'):
-            return first
-
-        if first.composition_type != NestedSolution.MULTIPLE and second.composition_type != NestedSolution.MULTIPLE:
-            if self.k == 1:
-                if first.cost < second.cost:
-                    return first
-                else:
-                    return second
-            return NestedSolution(first.cost, None, NestedSolution.MULTIPLE, None, self.accumulate,
-                                  [first, second] if first.cost < second.cost else [second, first])
-
-        first_candidates, second_candidates = [first], [second]
-        if first.composition_type == NestedSolution.MULTIPLE:
-            first_candidates = first.children
-        if second.composition_type == NestedSolution.MULTIPLE:
-            second_candidates = second.children
-
-        if self.k == 1:
-            if first_candidates[0].cost < second_candidates[0].cost:
-                return first_candidates[0]
-            else:
-                return second_candidates[0]
-
-        # merge two arrays of solutions with sorted costs
-        children = []
-        i, j = 0, 0
-        while len(children) < self.k and i < len(first_candidates) and j < len(second_candidates):
-            first_child, second_child = first_candidates[i], second_candidates[j]
-            if first_child.cost < second_child.cost:
-                children.append(first_child)
-                i += 1
-            elif first_child.cost > second_child.cost:
-                children.append(second_child)
-                j += 1
-            else:
-                children.append(first_child)
-                i += 1
-                if len(children) < self.k:
-                    children.append(second_child)
-                    j += 1
-        while i < len(first_candidates) and len(children) < self.k:
-            children.append(first_candidates[i])
-            i += 1
-        while j < len(second_candidates) and len(children) < self.k:
-            children.append(second_candidates[j])
-            j += 1
-
-        return NestedSolution(children[0].cost, None, NestedSolution.MULTIPLE, None, self.accumulate, children)
-
-    def add_loss(self, loss_cost, solution):
-        if solution.composition_type == NestedSolution.MULTIPLE:
-            new_children = []
-            for child in solution.children:
-                new_children.append(NestedSolution(child.cost + loss_cost, child.association,
-                                                   child.composition_type, child.event, self.accumulate,
-                                                   child.children))
-            return NestedSolution(new_children[0].cost, None, NestedSolution.MULTIPLE,
-                                  None, self.accumulate, new_children)
-        else:
-            return NestedSolution(solution.cost + loss_cost, solution.association,
-                                  solution.composition_type, solution.event, self.accumulate,
-                                  solution.children)
-
-
-
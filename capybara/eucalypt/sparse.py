@@ -0,0 +1,39 @@
+INF = float('Inf')
+
+
+class SparseRow:
+    """
+    Row of a dynamic programming matrix storing only its non-empty cells
+
+    Reads and writes go through the host index like a list, an empty cell (the default value,
+    or a solution of infinite cost) is not stored and reads as the default value
+    """
+    def __init__(self, size, default):
+        self.size = size
+        self.default = default
+        self.cells = {}
+
+    def __getitem__(self, index):
+        return self.cells.get(index, self.default)
+
+    def __setitem__(self, index, value):
+        if value is self.default or value.cost == INF:
+            self.cells.pop(index, None)
+        else:
+            self.cells[index] = value
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        """All the cells in host order, the empty ones included"""
+        cells, default = self.cells, self.default
+        return (cells.get(index, default) for index in range(self.size))
+
+    def items(self):
+        """The non-empty cells in host order"""
+        return sorted(self.cells.items())
+
+
+def sparse_matrix(num_rows, num_columns, default):
+    return [SparseRow(num_columns, default) for _ in range(num_rows)]
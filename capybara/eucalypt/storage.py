@@ -0,0 +1,169 @@
+import struct
+import sys
+from array import array
+from capybara.eucalypt.nexparser import tree_from_newick
+from capybara.eucalypt.solution import Association, NestedSolution, SolutionGenerator
+
+
+MAGIC = b'CAPYDAG'
+VERSION = 1
+INT_COUNTS, FLOAT_COUNTS, BIG_COUNTS = 0, 1, 2  # encodings of the numbers of subsolutions
+
+
+class SolutionFileException(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def write_array(file, values):
+    """Arrays are stored little-endian whatever the machine, prefixed by their length"""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    file.write(struct.pack('<Q', len(values)))
+    values.tofile(file)
+
+
+def read_array(file, typecode):
+    length, = struct.unpack('<Q', read_exactly(file, 8))
+    values = array(typecode)
+    values.frombytes(read_exactly(file, length * values.itemsize))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def write_string(file, text):
+    data = text.encode('utf-8')
+    file.write(struct.pack('<Q', len(data)))
+    file.write(data)
+
+
+def read_string(file):
+    length, = struct.unpack('<Q', read_exactly(file, 8))
+    return read_exactly(file, length).decode('utf-8')
+
+
+def read_exactly(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise SolutionFileException('The solution file is truncated.')
+    return data
+
+
+def topological_order(root):
+    """
+    The nodes reachable from the root, each after all its children, a shared node is listed once
+    """
+    order, visited = [], set()
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            order.append(node)
+            continue
+        if id(node) in visited:
+            continue
+        visited.add(id(node))
+        stack.append((node, True))
+        for child in reversed(node.children):
+            if id(child) not in visited:
+                stack.append((child, False))
+    return order
+
+
+def write_solutions(file, parasite_tree, host_tree, leaf_map, root):
+    """
+    Write the trees, the leaf map and the solution graph reachable from the root to a binary file
+
+    The nodes are stored as a table of parallel arrays, children before parents, the children of each node
+    as indices into that table and the associations as (symbiont index, host index)
+    """
+    if type(root) is not NestedSolution:
+        raise TypeError('Only the solutions of the solution enumeration can be saved.')
+    nodes = topological_order(root)
+    position = {id(node): index for index, node in enumerate(nodes)}
+
+    costs, composition_types, events, accumulates = array('d'), array('b'), array('b'), array('b')
+    parasites, hosts = array('i'), array('i')
+    offsets, children = array('q', [0]), array('i')
+    counts = [node.num_subsolutions for node in nodes]
+    for node in nodes:
+        costs.append(node.cost)
+        composition_types.append(node.composition_type)
+        events.append(-1 if node.event is None else node.event)
+        accumulates.append(node.accumulate)
+        if node.association is None:
+            parasites.append(-1)
+            hosts.append(-1)
+        else:
+            parasites.append(node.association.parasite.index)
+            hosts.append(node.association.host.index)
+        children.extend(position[id(child)] for child in node.children)
+        offsets.append(len(children))
+
+    file.write(MAGIC)
+    file.write(struct.pack('<B', VERSION))
+    write_string(file, repr(host_tree))
+    write_string(file, repr(parasite_tree))
+    write_array(file, array('i', (leaf_map[parasite].index if parasite.is_leaf() else -1
+                                  for parasite in parasite_tree)))
+    for values in (costs, composition_types, events, accumulates, parasites, hosts, offsets, children):
+        write_array(file, values)
+
+    if any(isinstance(count, float) for count in counts):
+        file.write(struct.pack('<B', FLOAT_COUNTS))
+        write_array(file, array('d', counts))
+    elif all(-2 ** 63 <= count < 2 ** 63 for count in counts):
+        file.write(struct.pack('<B', INT_COUNTS))
+        write_array(file, array('q', counts))
+    else:
+        file.write(struct.pack('<B', BIG_COUNTS))
+        write_string(file, ' '.join(map(str, counts)))
+
+
+def read_solutions(file):
+    """
+    Read a file written by write_solutions, return the symbiont tree, the host tree, the leaf map and the root
+    """
+    if file.read(len(MAGIC)) != MAGIC:
+        raise SolutionFileException('The file is not a solution file.')
+    version, = struct.unpack('<B', read_exactly(file, 1))
+    if version != VERSION:
+        raise SolutionFileException(f'The solution file version {version} is not supported.')
+
+    host_tree = tree_from_newick(read_string(file), '!H')
+    parasite_tree = tree_from_newick(read_string(file), '!P')
+    leaf_hosts = read_array(file, 'i')
+    leaf_map = {parasite: host_tree.nodes[leaf_hosts[parasite.index]]
+                for parasite in parasite_tree if parasite.is_leaf()}
+
+    costs, composition_types, events, accumulates = (read_array(file, typecode) for typecode in 'dbbb')
+    parasites, hosts, offsets, children = (read_array(file, typecode) for typecode in 'iiqi')
+    count_type, = struct.unpack('<B', read_exactly(file, 1))
+    if count_type == INT_COUNTS:
+        counts = read_array(file, 'q')
+    elif count_type == FLOAT_COUNTS:
+        counts = read_array(file, 'd')
+    else:
+        counts = list(map(int, read_string(file).split()))
+
+    nodes, associations = [], {}
+    for index, cost in enumerate(costs):
+        p, h = parasites[index], hosts[index]
+        association = None
+        if p >= 0:
+            association = associations.get((p, h))
+            if association is None:
+                association = associations[p, h] = Association(parasite_tree.nodes[p], host_tree.nodes[h])
+        children_nodes = [nodes[child] for child in children[offsets[index]:offsets[index + 1]]]
+        if cost == float('Inf') and association is None and not children_nodes:
+            nodes.append(SolutionGenerator.EMPTY)
+            continue
+        nodes.append(NestedSolution(int(cost) if cost.is_integer() else cost, association,
+                                    composition_types[index], None if events[index] < 0 else events[index],
+                                    bool(accumulates[index]), children_nodes, counts[index]))
+    if not nodes:
+        raise SolutionFileException('The solution file is empty.')
+    return parasite_tree, host_tree, leaf_map, nodes[-1]
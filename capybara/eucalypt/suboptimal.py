@@ -0,0 +1,161 @@
+from capybara.eucalypt.cost import CostMatrices, INF
+from capybara.eucalypt.solution import Association, NestedSolution
+
+
+class SuboptimalMatrices(CostMatrices):
+    """
+    Solution graph of all the solutions of cost at most the optimal cost plus delta
+
+    Each cell keeps one solution node per cost, from its optimal cost up to its optimal cost plus delta,
+    and the node of a cost only combines child nodes adding up to that cost. Every solution read from the node
+    of a cost has exactly that cost, so the root lists the solutions within delta of the optimum
+    and nothing else. Keeping only the costs within delta of the optimum of a cell is exact, see HistogramMatrices
+    """
+    def __init__(self, host_tree, parasite_tree, leaf_map,
+                 cospeciation_cost, duplication_cost, transfer_cost, loss_cost, receiver_index,
+                 allowed_transfers, delta, solution_generator):
+        super().__init__(host_tree, parasite_tree, leaf_map,
+                         cospeciation_cost, duplication_cost, transfer_cost, loss_cost, receiver_index,
+                         allowed_transfers)
+        self.delta = delta
+        self.solution_generator = solution_generator
+        self.hosts = list(host_tree)
+        self.main_nodes = [None] * parasite_tree.size()
+        self.subtree_nodes = [None] * parasite_tree.size()
+
+    def run(self):
+        """
+        The root of the solutions within delta of the optimum, in increasing cost order
+        """
+        for parasite in self.parasite_tree:
+            self.fill_row(parasite)
+        bound = self.optimal_cost() + self.delta
+        layers = {}
+        for cell in self.main_nodes[self.parasite_tree.root.index]:
+            for cost, node in cell.items():
+                if cost <= bound:
+                    layers.setdefault(cost, []).append(node)
+
+        children = []
+        for cost in sorted(layers):
+            for node in layers[cost]:
+                if node.composition_type == NestedSolution.MULTIPLE:
+                    children.extend(node.children)
+                else:
+                    children.append(node)
+        if not children:
+            return self.solution_generator.empty_solution()
+        if len(children) == 1:
+            return children[0]
+        return NestedSolution(children[0].cost, None, NestedSolution.MULTIPLE, None,
+                              self.solution_generator.accumulate, children)
+
+    def merge_layers(self, layers):
+        return {cost: self.solution_generator.best_solution(nodes) for cost, nodes in layers.items()}
+
+    def fill_row(self, parasite):
+        super().fill_row(parasite)
+        if parasite.is_leaf():
+            self.fill_leaf_nodes(parasite)
+        else:
+            self.fill_main_nodes(parasite)
+            self.fill_subtree_nodes(parasite)
+
+    def fill_leaf_nodes(self, parasite):
+        p, host = parasite.index, self.leaf_map[parasite]
+        association = Association(parasite, host)
+        main = [{} for _ in self.hosts]
+        subtree = [{} for _ in self.hosts]
+        main[host.index] = {0: self.solution_generator.from_leaf_association(association)}
+        subtree[host.index] = main[host.index]
+
+        distance = 1
+        ancestor = host.parent
+        while ancestor:
+            cost = self.loss_cost * distance
+            if cost <= self.subtree[p][ancestor.index] + self.delta:
+                subtree[ancestor.index] = {cost: self.solution_generator.from_leaf_association(
+                    association, self.loss_cost, distance)}
+            ancestor = ancestor.parent
+            distance += 1
+        self.main_nodes[p], self.subtree_nodes[p] = main, subtree
+
+    def add_candidate(self, layers, new_cost, first, second, association, event, num_losses, bound):
+        for first_cost, first_node in first.items():
+            for second_cost, second_node in second.items():
+                if new_cost + first_cost + second_cost <= bound:
+                    solution = self.solution_generator.cartesian(new_cost, first_node, second_node,
+                                                                 association, event, num_losses)
+                    layers.setdefault(solution.cost, []).append(solution)
+
+    def receivers(self, parasite_index, host_index, bound):
+        """
+        Host-switch receivers where the main row of the symbiont is at most the bound
+        """
+        main = self.main[parasite_index]
+        if self.receiver_index is None:
+            return [receiver for receiver in self.transfer_targets[host_index] if main[receiver] <= bound]
+        subtree = self.receiver_rows[parasite_index][0]
+        return self.receiver_index.receivers_within(host_index, main, subtree, bound)
+
+    def fill_main_nodes(self, parasite):
+        p, p1, p2 = parasite.index, parasite.left_child.index, parasite.right_child.index
+        main1, subtree1 = self.main_nodes[p1], self.subtree_nodes[p1]
+        main2, subtree2 = self.main_nodes[p2], self.subtree_nodes[p2]
+        cospeciation, duplication = NestedSolution.COSPECIATION, NestedSolution.DUPLICATION
+        cospeciation_cost, duplication_cost = self.cospeciation_cost, self.duplication_cost
+        transfer_cost, loss_cost = self.transfer_cost, self.loss_cost
+        add = self.add_candidate
+
+        row = []
+        for host in self.hosts:
+            h, layers = host.index, {}
+            if self.main[p][h] == INF:
+                row.append({})
+                continue
+            bound = self.main[p][h] + self.delta
+            association = Association(parasite, host)
+            left, right = self.left[h], self.right[h]
+            if left >= 0:
+                add(layers, cospeciation_cost, subtree1[left], subtree2[right], association, cospeciation, 0, bound)
+                add(layers, cospeciation_cost, subtree1[right], subtree2[left], association, cospeciation, 0, bound)
+                add(layers, duplication_cost, main1[h], main2[h], association, duplication, 0, bound)
+                add(layers, duplication_cost + loss_cost, main1[h], subtree2[left], association, duplication, 1,
+                    bound)
+                add(layers, duplication_cost + loss_cost, main1[h], subtree2[right], association, duplication, 1,
+                    bound)
+                add(layers, duplication_cost + loss_cost, subtree1[left], main2[h], association, duplication, 1,
+                    bound)
+                add(layers, duplication_cost + loss_cost, subtree1[right], main2[h], association, duplication, 1,
+                    bound)
+                add(layers, duplication_cost + loss_cost + loss_cost, subtree1[left], subtree2[left],
+                    association, duplication, 2, bound)
+                add(layers, duplication_cost + loss_cost + loss_cost, subtree1[right], subtree2[right],
+                    association, duplication, 2, bound)
+            else:
+                add(layers, duplication_cost, main1[h], main2[h], association, duplication, 0, bound)
+
+            for receiver in self.receivers(p1, h, bound - transfer_cost - self.subtree[p2][h]):
+                add(layers, transfer_cost, main1[receiver], subtree2[h], association,
+                    NestedSolution.HOST_SWITCH, 0, bound)
+            for receiver in self.receivers(p2, h, bound - transfer_cost - self.subtree[p1][h]):
+                add(layers, transfer_cost, subtree1[h], main2[receiver], association,
+                    NestedSolution.HOST_SWITCH, 0, bound)
+            row.append(self.merge_layers(layers))
+        self.main_nodes[p] = row
+
+    def fill_subtree_nodes(self, parasite):
+        p = parasite.index
+        main, row = self.main_nodes[p], self.main_nodes[p][:]
+        for host_index, (left, right) in enumerate(zip(self.left, self.right)):  # postorder, children first
+            if left < 0:
+                continue
+            bound = self.subtree[p][host_index] + self.delta
+            layers = {cost: [node] for cost, node in main[host_index].items()}
+            for child in (left, right):
+                for cost, node in row[child].items():
+                    if cost + self.loss_cost <= bound:
+                        layers.setdefault(cost + self.loss_cost, []).append(
+                            self.solution_generator.add_loss(self.loss_cost, node))
+            row[host_index] = self.merge_layers(layers)
+        self.subtree_nodes[p] = row
@@ -0,0 +1,202 @@
+import weakref
+
+
+_receiver_indices = weakref.WeakKeyDictionary()
+_distance_indices = weakref.WeakKeyDictionary()
+
+
+def get_receiver_index(host_tree):
+    """
+    The receiver index of a host tree, built once and shared by all the reconciliators on that tree
+    """
+    if host_tree not in _receiver_indices:
+        _receiver_indices[host_tree] = ReceiverIndex(host_tree)
+    return _receiver_indices[host_tree]
+
+
+def get_distance_index(host_tree, maximum_distance):
+    """
+    A distance index of a host tree covering at least the given distance, shared like get_receiver_index
+    """
+    maximum_distance = min(maximum_distance, largest_distance(host_tree))
+    index = _distance_indices.get(host_tree)
+    if index is None or index.maximum_distance < maximum_distance:
+        index = DistanceIndex(host_tree, maximum_distance)
+        _distance_indices[host_tree] = index
+    return index
+
+
+def largest_distance(host_tree):
+    """
+    Upper bound on the number of edges between two hosts, twice the depth of the deepest host
+    """
+    return 2 * max(host_tree.depth)
+
+
+class AllowedTransfers:
+    """
+    The hosts incomparable to a host, i.e. neither in its subtree nor on its path to the root
+
+    The subtree of a host covers the postorder indices from its start to its own index,
+    so the set is never materialized
+    """
+    def __init__(self, receiver_index, host_index):
+        self.receiver_index = receiver_index
+        self.host_index = host_index
+
+    def __iter__(self):
+        """Same order as the traversal in Reconciliator.get_allowed_transfers"""
+        index = self.receiver_index
+        current = self.host_index
+        while index.parent[current] >= 0:
+            sibling = index.sibling[current]
+            for receiver in range(index.start[sibling], sibling + 1):
+                yield index.nodes[receiver]
+            current = index.parent[current]
+
+    def __contains__(self, host):
+        return self.receiver_index.is_incomparable(self.host_index, host.index)
+
+    def __len__(self):
+        index = self.receiver_index
+        return index.size - (self.host_index - index.start[self.host_index] + 1) - index.depth[self.host_index]
+
+
+class ReceiverIndex:
+    """
+    Host-switch receivers when a symbiont can switch to any host incomparable to its current host
+    """
+    def __init__(self, host_tree):
+        self.size = host_tree.size()
+        self.nodes = host_tree.nodes
+        # the index arrays of the host tree, see Tree
+        self.left, self.right = host_tree.left_index, host_tree.right_index
+        self.parent, self.sibling = host_tree.parent_index, host_tree.sibling_index
+        self.start, self.depth = host_tree.start, host_tree.depth
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['nodes'] = None  # the worker processes only read the index arrays
+        return state
+
+    def is_incomparable(self, first, second):
+        return not (self.start[first] <= second <= first or self.start[second] <= first <= second)
+
+    def allowed_transfers(self, host):
+        return AllowedTransfers(self, host.index)
+
+    def best_receivers(self, main):
+        """
+        Minimum of a cost row over the subtree of each host, and over the hosts incomparable to each host
+        """
+        subtree = main[:]
+        for host_index in range(self.size):  # postorder, children first
+            left = self.left[host_index]
+            if left >= 0:
+                subtree[host_index] = min(subtree[host_index], subtree[left], subtree[self.right[host_index]])
+
+        incomparable = [float('Inf')] * self.size
+        for host_index in reversed(range(self.size)):  # reversed postorder, parents first
+            left = self.left[host_index]
+            if left >= 0:
+                right = self.right[host_index]
+                incomparable[left] = min(incomparable[host_index], subtree[right])
+                incomparable[right] = min(incomparable[host_index], subtree[left])
+        return subtree, incomparable
+
+    def receivers(self, host_index, rows):
+        """
+        Generate the incomparable hosts where at least one row reaches its cost, in the order of
+        Reconciliator.get_allowed_transfers, together with the flags telling which rows do
+
+        Each row is a triple (main, subtree, cost) where subtree is the first output of best_receivers
+        """
+        current = host_index
+        while self.parent[current] >= 0:
+            sibling = self.sibling[current]
+            if any(subtree[sibling] == cost for _, subtree, cost in rows):
+                yield from self.subtree_receivers(sibling, rows)
+            current = self.parent[current]
+
+    def subtree_receivers(self, top, rows):
+        """
+        Postorder walk of the subtree rooted at top, skipping the subtrees where no row can reach its cost
+        """
+        stack = [(top, False)]
+        while stack:
+            host_index, expanded = stack.pop()
+            if expanded:
+                flags = [main[host_index] == cost for main, _, cost in rows]
+                if any(flags):
+                    yield host_index, flags
+                continue
+            if not any(subtree[host_index] == cost for _, subtree, cost in rows):
+                continue
+            stack.append((host_index, True))
+            left = self.left[host_index]
+            if left >= 0:
+                stack.append((self.right[host_index], False))
+                stack.append((left, False))
+
+    def receivers_within(self, host_index, main, subtree, bound):
+        """
+        Generate the incomparable hosts where a cost row is at most the bound, subtree is its subtree minima
+        """
+        current = host_index
+        while self.parent[current] >= 0:
+            stack = [self.sibling[current]]
+            while stack:
+                receiver = stack.pop()
+                if subtree[receiver] > bound:
+                    continue
+                if main[receiver] <= bound:
+                    yield receiver
+                if self.left[receiver] >= 0:
+                    stack.append(self.right[receiver])
+                    stack.append(self.left[receiver])
+            current = self.parent[current]
+
+
+class DistanceIndex:
+    """
+    Host-switch receivers within a maximum distance (number of edges) of the current host
+
+    The incomparable hosts around each host are listed once, bucketed by distance,
+    so that any threshold up to the maximum reads a prefix of the list.
+    The maximum is clamped to the largest distance in the tree, a larger threshold reads the whole list
+    """
+    def __init__(self, host_tree, maximum_distance):
+        maximum_distance = min(maximum_distance, largest_distance(host_tree))
+        self.maximum_distance = maximum_distance
+        self.nodes = host_tree.nodes
+        self.receivers = []
+        self.offsets = []  # offsets[h][d] is the number of receivers of h at distance at most d
+        for host in host_tree:
+            buckets = [[] for _ in range(maximum_distance + 1)]
+            current, distance = host, 2
+            while not current.is_root() and distance <= maximum_distance:
+                stack = [(current.get_sibling(), distance)]
+                while stack:
+                    receiver, receiver_distance = stack.pop()
+                    buckets[receiver_distance].append(receiver.index)
+                    if not receiver.is_leaf() and receiver_distance < maximum_distance:
+                        stack.append((receiver.right_child, receiver_distance + 1))
+                        stack.append((receiver.left_child, receiver_distance + 1))
+                current = current.parent
+                distance += 1
+
+            receivers, offsets = [], []
+            for bucket in buckets:
+                receivers.extend(bucket)
+                offsets.append(len(receivers))
+            self.receivers.append(receivers)
+            self.offsets.append(offsets)
+
+    def receiver_indices(self, host_index, distance_threshold):
+        distance = min(distance_threshold, self.maximum_distance)
+        if distance < 0:
+            return []
+        return self.receivers[host_index][:self.offsets[host_index][distance]]
+
+    def allowed_transfers(self, host, distance_threshold):
+        return [self.nodes[receiver] for receiver in self.receiver_indices(host.index, distance_threshold)]
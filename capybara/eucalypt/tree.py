@@ -10,6 +10,7 @@ class TreeNode:
         self.label = str(key)
         self.index = -1
         self.internal_index = -1
+        self.tree = None  # the linearized tree holding the index arrays
 
     def __repr__(self):
         return self.label
@@ -20,7 +21,7 @@ class TreeNode:
         return False
 
     def __hash__(self):
-        return hash(repr(self))
+        return hash(self.label)
 
     def add_child(self, child):
         if not self.has_left_child():
@@ -45,7 +46,7 @@ class TreeNode:
     def get_sibling(self):
         if self.is_root():
             return None
-        if self == self.parent.left_child:
+        if self is self.parent.left_child:
             return self.parent.right_child
         return self.parent.left_child
 
@@ -54,6 +55,9 @@ class TreeNode:
 
     def is_ancestor_of(self, node):
         """Am I an ancestor of (or equal to) that node?"""
+        tree = self.tree
+        if tree is not None and node.tree is tree:
+            return tree.start[self.index] <= node.index <= self.index
         current_node = node
         while current_node is not None:
             if current_node.label == self.label:
@@ -64,10 +68,16 @@ class TreeNode:
     def get_proper_descendants(self):
         """get all nodes in the subtree NOT INCLUDING MYSELF
         used for the construction of Stolzer temporal constraint graph"""
-        if self.is_leaf():
-            return []
-        return [self.left_child, self.right_child] +\
-                self.left_child.get_proper_descendants() + self.right_child.get_proper_descendants()
+        if self.tree is not None:
+            return self.tree.nodes[self.tree.start[self.index]:self.index]
+        descendants = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if not node.is_leaf():
+                descendants.extend([node.left_child, node.right_child])
+                stack.extend([node.right_child, node.left_child])
+        return descendants
 
     def get_proper_ancestors(self):
         """get all ancestors NOT INCLUDING MYSELF
@@ -83,10 +93,16 @@ class TreeNode:
 class Tree:
     """
     Rooted ordered full binary tree
+
+    Once linearized, the nodes are numbered in post-order and the tree keeps parallel arrays over these indices
+    (-1 for a missing node). The subtree of a node covers the indices from start to its own index,
+    so the ancestor and descendant queries are interval tests
     """
     def __init__(self, key):
         self.nodes = []
         self.root = TreeNode(key)
+        self.parent_index, self.left_index, self.right_index, self.sibling_index = [], [], [], []
+        self.depth, self.start = [], []
 
     def __iter__(self):
         for u in self.nodes:
@@ -100,6 +116,24 @@ class Tree:
         # No longer supported
         raise NotImplementedError
 
+    def copy(self):
+        """A linearized copy of the tree, with new nodes of the same keys and labels"""
+        tree = Tree(self.root.key)
+        copies = [None] * len(self.nodes)
+        for node in self.nodes:  # post-order, children first
+            new_node = tree.root if node is self.root else TreeNode(node.key)
+            new_node.label = node.label
+            if node.left_child is not None:
+                new_node.left_child = copies[node.left_child.index]
+                new_node.left_child.parent = new_node
+            if node.right_child is not None:
+                new_node.right_child = copies[node.right_child.index]
+                new_node.right_child.parent = new_node
+            copies[node.index] = new_node
+        tree.nodes = copies
+        tree.set_indices()
+        return tree
+
     def size(self):
         if not self.nodes:
             self.linearize()
@@ -109,33 +143,75 @@ class Tree:
         return self.root
 
     def linearize_(self, node):
-        if node.is_leaf():
-            self.nodes.append(node)
-        else:
-            if node.has_left_child():
-                self.linearize_(node.left_child)
-            if node.has_right_child():
-                self.linearize_(node.right_child)
-            self.nodes.append(node)
+        stack = [(node, False)]
+        while stack:
+            current, expanded = stack.pop()
+            if expanded or current.is_leaf():
+                self.nodes.append(current)
+                continue
+            stack.append((current, True))
+            if current.has_right_child():
+                stack.append((current.right_child, False))
+            if current.has_left_child():
+                stack.append((current.left_child, False))
 
     def linearize(self):
         self.linearize_(self.root)
+        self.set_indices()
+
+    def set_indices(self):
+        """Number the nodes already listed in post-order and build the index arrays"""
         j = 0
-        for index, node in enumerate(self):
+        for index, node in enumerate(self.nodes):
             if not node.is_leaf():
                 node.internal_index = j
                 j += 1
             node.index = index
+            node.tree = self
+        self.build_arrays()
+
+    def build_arrays(self):
+        size = len(self.nodes)
+        self.parent_index = [-1 if node.parent is None else node.parent.index for node in self.nodes]
+        self.left_index = [-1 if node.left_child is None else node.left_child.index for node in self.nodes]
+        self.right_index = [-1 if node.right_child is None else node.right_child.index for node in self.nodes]
+        self.sibling_index = [-1] * size
+        self.start = list(range(size))
+        for index in range(size):  # post-order, children first
+            left, right = self.left_index[index], self.right_index[index]
+            if left >= 0:
+                self.start[index] = self.start[left]
+                self.sibling_index[left] = right
+            if right >= 0:
+                self.sibling_index[right] = left
+        self.depth = [0] * size
+        for index in reversed(range(size)):  # parents first
+            parent = self.parent_index[index]
+            if parent >= 0:
+                self.depth[index] = self.depth[parent] + 1
+
+    def is_ancestor(self, first, second):
+        """Is the node of index first an ancestor of (or equal to) the node of index second?"""
+        return self.start[first] <= second <= first
 
     def post_order_string(self, node):
-        if node.is_leaf():
-            return repr(node)
-        left_string, right_string = '', ''
-        if node.has_left_child():
-            left_string = self.post_order_string(node.left_child)
-        if node.has_right_child():
-            right_string = self.post_order_string(node.right_child)
-        return '(' + ','.join([left_string, right_string]) + ')' + repr(node)
+        parts = []
+        stack = [node]  # nodes to write, and the strings between them
+        while stack:
+            current = stack.pop()
+            if isinstance(current, str):
+                parts.append(current)
+            elif current.is_leaf():
+                parts.append(repr(current))
+            else:
+                stack.append(')' + repr(current))
+                if current.has_right_child():
+                    stack.append(current.right_child)
+                stack.append(',')
+                if current.has_left_child():
+                    stack.append(current.left_child)
+                stack.append('(')
+        return ''.join(parts)
 
     def is_full(self):
         # for the problem we assume that all trees are full (all internal nodes have out-degree 2)
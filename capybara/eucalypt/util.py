@@ -34,6 +34,63 @@ class UF:
         self._count -= 1
 
 
+class LCAIndex:
+    """
+    Lowest common ancestors in constant time, by a range minimum query on the Euler tour of the tree
+
+    The sparse table keeps, for each power of two, the shallowest node of every window of the tour
+    """
+    def __init__(self, tree):
+        self.nodes = tree.nodes
+        depth = tree.depth
+        tour, self.first = [], [0] * tree.size()
+        stack = [(tree.root.index, False)]
+        while stack:
+            index, returning = stack.pop()
+            if returning:
+                tour.append(tree.parent_index[index])
+                continue
+            self.first[index] = len(tour)
+            tour.append(index)
+            left = tree.left_index[index]
+            if left >= 0:
+                right = tree.right_index[index]
+                stack.extend([(right, True), (right, False), (left, True), (left, False)])
+
+        self.depth = depth
+        self.table = [tour]
+        width = 1
+        while 2 * width <= len(tour):
+            previous = self.table[-1]
+            self.table.append([a if depth[a] <= depth[b] else b
+                               for a, b in zip(previous, previous[width:])])
+            width *= 2
+
+    def lca_index(self, first, second):
+        low, high = self.first[first], self.first[second]
+        if low > high:
+            low, high = high, low
+        level = (high - low + 1).bit_length() - 1
+        row = self.table[level]
+        a, b = row[low], row[high - (1 << level) + 1]
+        return a if self.depth[a] <= self.depth[b] else b
+
+    def lca(self, first, second):
+        return self.nodes[self.lca_index(first.index, second.index)]
+
+
+def transfer_edges_from_lca(lca_index, pairs):
+    """
+    Return the set of transfer edges, the pairs whose hosts are incomparable, each pair is (h1, h2, edge)
+    """
+    transfer_edges = set()
+    for first, second, edge in pairs:
+        lca = lca_index.lca_index(first.index, second.index)
+        if lca != first.index and lca != second.index:
+            transfer_edges.add(edge)
+    return transfer_edges
+
+
 def tarjan_offline_lca(tree, pairs, subroutine):
     """
     Find lowest common ancestor and do some additional processing
@@ -45,13 +102,19 @@ def tarjan_offline_lca(tree, pairs, subroutine):
     colored = {u: False for u in tree}
     ancestor = {}
 
-    def lca_subroutine(u):
-        ancestor[u] = u
-        if not u.is_leaf():
-            for v in [u.left_child, u.right_child]:
-                lca_subroutine(v)
-                uf.union(u.index, v.index)
-                ancestor[uf.find(u.index)] = u
+    stack = [(tree.root, 0)]  # a node with the number of its children already visited
+    while stack:
+        u, visited = stack.pop()
+        if visited == 0:
+            ancestor[u] = u
+        else:
+            v = u.right_child if visited == 2 else u.left_child
+            uf.union(u.index, v.index)
+            ancestor[uf.find(u.index)] = u
+        if not u.is_leaf() and visited < 2:
+            stack.append((u, visited + 1))
+            stack.append((u.left_child if visited == 0 else u.right_child, 0))
+            continue
         colored[u] = True
         if u in pairs:
             for v, e in pairs[u]:
@@ -59,7 +122,6 @@ def tarjan_offline_lca(tree, pairs, subroutine):
                     lca = ancestor[uf.find(v.index)]
                     if lca != u and lca != v:
                         subroutine(e)
-    lca_subroutine(tree.root)
 
 
 def tarjan_offline_lca_transfer_edges(host_tree, pairs):
@@ -105,18 +167,26 @@ def find_lca(root, n1, n2):
     """
     Return the least common ancestor of nodes n1 and n2 in a binary tree defined by root
     """
-    if root is None:
-        return None
-    if root == n1 or root == n2:
-        return root
-
-    left_lca = find_lca(root.left_child, n1, n2)
-    right_lca = find_lca(root.right_child, n1, n2)
-
-    if left_lca and right_lca:
-        return root
-
-    return left_lca if left_lca is not None else right_lca
+    results = {id(None): None}
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node is None:
+            continue
+        if not expanded:
+            if node == n1 or node == n2:
+                results[id(node)] = node
+                continue
+            stack.append((node, True))
+            stack.append((node.right_child, False))
+            stack.append((node.left_child, False))
+            continue
+        left_lca, right_lca = results[id(node.left_child)], results[id(node.right_child)]
+        if left_lca and right_lca:
+            results[id(node)] = node
+        else:
+            results[id(node)] = left_lca if left_lca is not None else right_lca
+    return results[id(root)]
 
 
 def is_cyclic(graph):
@@ -180,3 +250,29 @@ def flatten(node):
         for child in node.children:
             yield child
 
+
+def format_count(count):
+    """An exact count in full, an approximate (float) count in scientific notation"""
+    if isinstance(count, float):
+        return f'{count:.6e}'
+    return str(count)
+
+
+def trampoline(generator):
+    """
+    Run a recursive function written as a generator without growing the call stack
+
+    The generator yields the generator of each recursive call and is sent back its result
+    """
+    stack = [generator]
+    result = None
+    while stack:
+        try:
+            call = stack[-1].send(result)
+        except StopIteration as stop:
+            stack.pop()
+            result = stop.value
+            continue
+        stack.append(call)
+        result = None
+    return result
@@ -1,6 +1,6 @@
 from capybara.worker import Generator
 
 
-def run(input_name, task, cost_vector=(-1, 1, 1, 1), verbose=False):
-    generator = Generator(input_name, task, cost_vector, verbose)
+def run(input_name, task, cost_vector=(-1, 1, 1, 1), verbose=False, threshold=float('Inf'), processes=1):
+    generator = Generator(input_name, task, cost_vector, verbose, threshold, processes)
     return generator.run()
@@ -1,40 +1,179 @@
+import math
+from functools import reduce
 from capybara.eucalypt import reconciliator
+from capybara.eucalypt.count import count_optimal_solutions, cost_histogram, host_switch_indices
+from capybara.eucalypt.suboptimal import SuboptimalMatrices
+from capybara.eucalypt.solution import NestedSolution, SolutionGenerator
+from capybara.eucalypt.storage import read_solutions, write_solutions
+from capybara.eucalypt.util import LCAIndex
+from capybara.eucalypt.incremental import IncrementalReconciliator
 from capybara.equivalence import enumerate_classes as cla
+from capybara.equivalence.landscape import CostLandscape
 
 
 class DataInterface:
     """
     Interface between the input data and the reconciliators
     """
-    def __init__(self, parasite_tree, host_tree, leaf_map):
+    def __init__(self, parasite_tree, host_tree, leaf_map, threshold=float('Inf'), processes=1):
         self.parasite_tree = parasite_tree
         self.host_tree = host_tree
         self.leaf_map = leaf_map
         self.multiplier = 1000
-        self.threshold = float('Inf')
+        self.threshold = threshold  # maximum host-switch distance
+        self.processes = processes  # number of processes for the cost-only pass
+        self.sharing_summary = None  # shareable nodes asked for and shared in the last solution graph
+        self.lca_index = None
 
-    def count_solutions(self, cost_vector, task, cli=False):
+    def get_lca_index(self):
+        """
+        The LCA index of the host tree, built on the first call and shared by all the enumerated solutions
+        """
+        if self.lca_index is None:
+            self.lca_index = LCAIndex(self.host_tree)
+        return self.lca_index
+
+    def unscaled(self, cost):
+        """
+        A cost of the reconciliation in the units of the cost vector, a fractional cost is not truncated
+        """
+        if cost % self.multiplier == 0:
+            return cost // self.multiplier
+        return cost / self.multiplier
+
+    @staticmethod
+    def load_solutions(file_name, threshold=float('Inf'), processes=1):
+        """
+        Data and root of a solution graph saved by save_solutions, ready for counting, enumeration
+        or class computation without running the reconciliation again
+        """
+        with open(file_name, 'rb') as file:
+            parasite_tree, host_tree, leaf_map, root = read_solutions(file)
+        return DataInterface(parasite_tree, host_tree, leaf_map, threshold, processes), root
+
+    def save_solutions(self, file_name, root):
+        """
+        Save the input trees and the solution graph of a reconciliation (task 0) to a binary file
+        """
+        if root.composition_type == NestedSolution.MULTIPLE and not root.children:
+            raise ValueError('The root does not hold a solution graph.')
+        with open(file_name, 'wb') as file:
+            write_solutions(file, self.parasite_tree, self.host_tree, self.leaf_map, root)
+
+    def count_solutions(self, cost_vector, task, cli=False, approximate=False):
+        """
+        Optimal cost and root of the solutions (or classes), with approximate the numbers of classes
+        are floats, as only their order of magnitude is reliable
+
+        The solution graph of tasks 0 and 1 holds exact counts, an approximate number of solutions
+        is given by count_optimal_solutions
+        """
+        if approximate and task not in (2, 3):
+            raise ValueError('Approximate counts are only computed for the classes.')
         recon = reconciliator.ReconciliatorCounter(self.host_tree, self.parasite_tree, self.leaf_map,
                                                    cost_vector[0] * self.multiplier, cost_vector[1] * self.multiplier,
                                                    cost_vector[2] * self.multiplier, cost_vector[3] * self.multiplier,
                                                    self.threshold, task, cli)
+        recon.processes = self.processes
         root = recon.run()
-        opt_cost = root.cost // self.multiplier
+        self.sharing_summary = recon.solution_generator.sharing_summary()
+        opt_cost = self.unscaled(root.cost)
 
         if task in (2, 3):
             reachable = cla.fill_reachable_matrix(self.parasite_tree, self.host_tree, root)
-            root = cla.fill_class_matrix(self.parasite_tree, self.host_tree, self.leaf_map, reachable, task)
+            root = cla.fill_class_matrix(self.parasite_tree, self.host_tree, self.leaf_map, reachable, task,
+                                         approximate)
         return opt_cost, root
 
+    def count_optimal_solutions(self, cost_vector, approximate=False):
+        """
+        Optimal cost and number of optimal solutions, counted in the cost matrices without building
+        the solution graph. The rows are filled in a single process, with approximate the number is a float
+        """
+        cost, count = count_optimal_solutions(self.host_tree, self.parasite_tree, self.leaf_map,
+                                              cost_vector[0] * self.multiplier, cost_vector[1] * self.multiplier,
+                                              cost_vector[2] * self.multiplier, cost_vector[3] * self.multiplier,
+                                              self.threshold, approximate)
+        return self.unscaled(cost), count
+
+    def incremental_reconciliator(self, cost_vector, task, cli=False):
+        """
+        Run a reconciliation that can be updated after editing the leaf map or a symbiont subtree,
+        the edits do not change the problem of the interface
+        """
+        recon = IncrementalReconciliator(self.host_tree, self.parasite_tree, self.leaf_map,
+                                         cost_vector[0] * self.multiplier, cost_vector[1] * self.multiplier,
+                                         cost_vector[2] * self.multiplier, cost_vector[3] * self.multiplier,
+                                         self.threshold, task, cli)
+        recon.run()
+        return recon
+
+    def count_solutions_batch(self, cost_vectors, task):
+        """
+        Optimal cost and number of solutions (or event vectors, or classes) for each cost vector
+
+        The cost vectors are run one after the other, every cell of a run depends on its cost vector.
+        The batch only saves the runs of the integer cost vectors proportional to one already run
+        """
+        results = {}
+        answers = []
+        for cost_vector in cost_vectors:
+            factor = 1
+            if all(isinstance(cost, int) for cost in cost_vector):  # fractional costs are run as given
+                factor = reduce(math.gcd, map(abs, cost_vector)) or 1
+            reduced_vector = tuple(cost // factor for cost in cost_vector) if factor > 1 else tuple(cost_vector)
+            if reduced_vector not in results:
+                if task == 0:
+                    results[reduced_vector] = self.count_optimal_solutions(reduced_vector)
+                else:
+                    opt_cost, root = self.count_solutions(reduced_vector, task, cli=True)
+                    results[reduced_vector] = opt_cost, len(root.event_vectors) if task == 1 else root.num_subsolutions
+            opt_cost, count = results[reduced_vector]
+            answers.append((opt_cost * factor, count))
+        return answers
+
+    def cost_histogram(self, cost_vector, delta):
+        """
+        Number of solutions of each cost from the optimal cost up to the optimal cost plus delta
+        """
+        histogram = cost_histogram(self.host_tree, self.parasite_tree, self.leaf_map,
+                                   cost_vector[0] * self.multiplier, cost_vector[1] * self.multiplier,
+                                   cost_vector[2] * self.multiplier, cost_vector[3] * self.multiplier,
+                                   self.threshold, delta * self.multiplier)
+        return {self.unscaled(cost): count for cost, count in histogram.items()}
+
+    def cost_landscape(self, cospeciation_cost, loss_cost, duplication_range, switch_range):
+        """
+        Partition the box of duplication and host-switch costs into regions with the same optimal event vectors
+        """
+        landscape = CostLandscape(self.host_tree, self.parasite_tree, self.leaf_map,
+                                  cospeciation_cost, loss_cost, self.threshold)
+        return landscape.run(duplication_range, switch_range)
+
     def enumerate_solutions_setup(self, cost_vector, task, maximum, cli=False):
         recon = reconciliator.ReconciliatorEnumerator(self.host_tree, self.parasite_tree, self.leaf_map,
                                                       cost_vector[0] * self.multiplier, cost_vector[1] * self.multiplier,
                                                       cost_vector[2] * self.multiplier, cost_vector[3] * self.multiplier,
                                                       self.threshold, task, maximum, cli)
+        recon.processes = self.processes
         root = recon.run()
-        opt_cost = root.cost // self.multiplier
+        self.sharing_summary = recon.solution_generator.sharing_summary()
+        opt_cost = self.unscaled(root.cost)
         return opt_cost, root
 
+    def enumerate_suboptimal_setup(self, cost_vector, delta):
+        """
+        Root of all the solutions of cost at most the optimal cost plus delta, in increasing cost order
+        """
+        receiver_index, allowed_transfers = host_switch_indices(self.host_tree, self.threshold)
+        matrices = SuboptimalMatrices(self.host_tree, self.parasite_tree, self.leaf_map,
+                                      cost_vector[0] * self.multiplier, cost_vector[1] * self.multiplier,
+                                      cost_vector[2] * self.multiplier, cost_vector[3] * self.multiplier,
+                                      receiver_index, allowed_transfers, delta * self.multiplier,
+                                      SolutionGenerator(False))
+        root = matrices.run()
+        return self.unscaled(root.cost), root
+
     def enumerate_best_k(self, cost_vector, k):
         recon = reconciliator.ReconciliatorBestKEnumerator(self.host_tree, self.parasite_tree, self.leaf_map,
                                                            cost_vector[0] * self.multiplier,
@@ -42,5 +181,5 @@ class DataInterface:
                                                            cost_vector[2] * self.multiplier,
                                                            cost_vector[3] * self.multiplier, self.threshold, k)
         root = recon.run()
-        return root.cost // self.multiplier, recon.cost_summary, root
+        return self.unscaled(root.cost), recon.cost_summary, root
 
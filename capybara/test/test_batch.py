@@ -0,0 +1,68 @@
+import csv
+import json
+import os
+import signal
+import tempfile
+import time
+import unittest
+from unittest import mock
+from capybara import batch
+
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def output(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_counts(self):
+        output_name = self.output('results.jsonl')
+        summary = batch.run(['datasets/SFC.nex', 'datasets/RH.nex'], output_name, tasks=(1, 3),
+                            cost_vectors=[(-1, 1, 1, 1), (0, 1, 1, 1)], processes=2)
+        self.assertEqual(summary, {'ok': 8})
+        with open(output_name) as f:
+            rows = [json.loads(line) for line in f]
+        answers = {(os.path.basename(row['file']), row['task'], row['cost_vector']): row['answer'] for row in rows}
+        self.assertEqual(answers[('SFC.nex', 1, '0 1 1 1')], 184)
+        self.assertEqual(answers[('RH.nex', 1, '-1 1 1 1')], 1056)
+        self.assertEqual(answers[('RH.nex', 3, '0 1 1 1')], 4)
+        self.assertTrue(all(row['seconds'] >= 0 for row in rows))
+
+    def test_fractional_costs(self):
+        output_name = self.output('results.jsonl')
+        summary = batch.run(['datasets/SFC.nex'], output_name, cost_vectors=[(0, 0.5, 0.5, 0.5)], processes=1)
+        self.assertEqual(summary, {'ok': 1})
+        with open(output_name) as f:
+            row = json.loads(f.readline())
+        self.assertEqual((row['cost_vector'], row['optimal_cost'], row['answer']), ('0 0.5 0.5 0.5', 5.5, 184))
+
+    def test_failures(self):
+        with open(self.output('broken.nex'), 'w') as f:
+            f.write('#NEXUS\nBEGIN HOST;\n\tTREE * Host = (h0,h1);\nENDBLOCK;\n')
+        output_name = self.output('results.csv')
+        summary = batch.run([self.directory.name, 'datasets/SFC.nex'], output_name, processes=2)
+        self.assertEqual(summary, {'error': 1, 'ok': 1})
+        with open(output_name, newline='') as f:
+            rows = {os.path.basename(row['file']): row for row in csv.DictReader(f)}
+        self.assertEqual(rows['broken.nex']['message'], 'Could not read symbiont tree from Nexus file.')
+
+    @unittest.skipUnless(hasattr(signal, 'SIGALRM'), 'the timeout is only enforced with SIGALRM')
+    def test_timeout(self):
+        def slow_count(*args):
+            time.sleep(60)  # interrupted by the alarm
+
+        self.addCleanup(signal.signal, signal.SIGALRM, signal.getsignal(signal.SIGALRM))
+        job = 0, os.path.abspath('datasets/SFC.nex'), 1, (0, 1, 1, 1), float('Inf'), False, 0.05
+        with mock.patch.object(batch.DataInterface, 'count_optimal_solutions', slow_count):
+            rows = batch.run_job(job)
+        self.assertEqual([(row['status'], row['message']) for row in rows], [('timeout', 'Timed out after 0.05 s.')])
+
+    def test_options(self):
+        with self.assertRaises(ValueError):
+            batch.run('datasets', self.output('results.csv'), tasks=(5,))
+        with self.assertRaises(ValueError):
+            batch.run('datasets', self.output('results.csv'), cost_vectors=[(0, 1, 1)])
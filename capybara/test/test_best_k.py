@@ -0,0 +1,32 @@
+import unittest
+from capybara.eucalypt import nexparser
+from capybara.interface import DataInterface
+
+
+class BestKTestCase(unittest.TestCase):
+    @staticmethod
+    def read_data(input_file):
+        with open('datasets/' + input_file, 'r') as f:
+            parser = nexparser.NexusParser(f)
+            parser.read()
+        return DataInterface(parser.parasite_tree, parser.host_tree, parser.leaf_map)
+
+    def test_SFC_0111(self):
+        data = self.read_data('SFC.nex')
+        opt_cost, cost_summary, root = data.enumerate_best_k((0, 1, 1, 1), 200)
+        self.assertEqual(opt_cost, 11)
+        self.assertEqual(cost_summary, {11000: 184, 12000: 16})
+        costs = [solution.cost for solution in root.children]
+        self.assertEqual(costs, sorted(costs))
+
+    def test_COG4965_0121(self):
+        data = self.read_data('COG4965.nex')
+        opt_cost, cost_summary, root = data.enumerate_best_k((0, 1, 2, 1), 1000)
+        self.assertEqual(cost_summary, {40000: 640, 41000: 360})
+        self.assertEqual(len(set(map(id, root.children))), 1000)
+
+    def test_RH_m111_k1(self):
+        data = self.read_data('RH.nex')
+        opt_cost, cost_summary, root = data.enumerate_best_k((-1, 1, 1, 1), 1)
+        self.assertEqual(opt_cost, 8)
+        self.assertEqual(cost_summary, {8000: 1})
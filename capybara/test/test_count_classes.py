@@ -1,4 +1,7 @@
 import unittest
+from capybara.eucalypt.solution import Association
+from capybara.equivalence.equivalence_class import NestedClass
+from capybara.interface import DataInterface
 from capybara.test.test_worker import TestWorker
 
 
@@ -83,3 +86,22 @@ class CountClassesTestCase(unittest.TestCase):
         worker = TestWorker('Wolbachia.nex', 0, 1, 1, 1, task=3)
         self.assertEqual(worker.get_answer(), 76800)
 
+    def test_SFC_0110_approximate(self):
+        worker = TestWorker('SFC.nex', 0, 1, 1, 0, task=3)
+        data = DataInterface(worker.parasite_tree, worker.host_tree, worker.leaf_map)
+        _, root = data.count_solutions((0, 1, 1, 0), task=3, approximate=True)
+        self.assertIsInstance(root.num_subsolutions, float)
+        self.assertAlmostEqual(root.num_subsolutions, 888)
+
+    def test_association_keys(self):
+        worker = TestWorker('SFC.nex', 0, 1, 1, 1, task=3)
+        parasite = worker.parasite_tree.root
+        keys = set()
+        for host in list(worker.host_tree) + [NestedClass.GENERAL_NODE, NestedClass.SWITCH_NODE]:
+            association = Association(parasite, host)
+            self.assertEqual(association, Association(parasite, host))
+            self.assertEqual(hash(association), hash(Association(parasite, host)))
+            keys.add(association.key)
+        self.assertEqual(len(keys), worker.host_tree.size() + 2)
+        self.assertNotEqual(Association(parasite, worker.host_tree.root),
+                            Association(parasite.left_child, worker.host_tree.root))
@@ -1,4 +1,11 @@
 import unittest
+from unittest import mock
+from capybara import counter
+from capybara.eucalypt import nexparser, parallel
+from capybara.eucalypt.solution import Association
+from capybara.eucalypt.storage import topological_order
+from capybara.eucalypt.transfer import get_distance_index
+from capybara.interface import DataInterface
 from capybara.test.test_worker import TestWorker
 
 
@@ -79,3 +86,177 @@ class CountSolutionsTestCase(unittest.TestCase):
         worker = TestWorker('COG2085.nex', 0, 2, 3, 1, task=0)
         self.assertEqual(worker.get_answer(), 46656)
 
+    def test_COG4965_0111_distance4(self):
+        worker = TestWorker('COG4965.nex', 0, 1, 1, 1, task=0, threshold=4)
+        self.assertEqual(worker.get_answer(), 2)
+
+    def test_COG4965_0111_distance6(self):
+        worker = TestWorker('COG4965.nex', 0, 1, 1, 1, task=0, threshold=6)
+        self.assertEqual(worker.get_answer(), 80)
+
+    def test_COG2085_0111_distance_above_height(self):
+        worker = TestWorker('COG2085.nex', 0, 1, 1, 1, task=0, threshold=200000)
+        self.assertEqual(worker.get_answer(), 44544)
+        index = get_distance_index(worker.host_tree, 200000)
+        self.assertEqual(index.maximum_distance, 2 * max(worker.host_tree.depth))
+        data = DataInterface(worker.parasite_tree, worker.host_tree, worker.leaf_map, threshold=200000)
+        unbounded = DataInterface(worker.parasite_tree, worker.host_tree, worker.leaf_map)
+        self.assertEqual(data.count_optimal_solutions((0, 1, 1, 1)), unbounded.count_optimal_solutions((0, 1, 1, 1)))
+
+    def test_COG2085_0111_parallel(self):
+        for min_cells in (parallel.MIN_POOL_CELLS, 0):  # the small levels in the main process, then none
+            worker = TestWorker('COG2085.nex', 0, 1, 1, 1, task=0)
+            worker.reconciliator.processes = 2
+            with mock.patch.object(parallel, 'MIN_POOL_CELLS', min_cells):
+                self.assertEqual(worker.get_answer(), 44544)
+
+    def test_COG4965_batch(self):
+        with open('datasets/COG4965.nex', 'r') as f:
+            parser = nexparser.NexusParser(f)
+            parser.read()
+        data = DataInterface(parser.parasite_tree, parser.host_tree, parser.leaf_map)
+        answers = data.count_solutions_batch([(0, 1, 1, 1), (0, 1, 2, 1), (0, 2, 3, 1), (0, 2, 2, 2)], task=0)
+        self.assertEqual([count for _, count in answers], [17408, 640, 6528, 17408])
+        self.assertEqual(answers[3][0], 2 * answers[0][0])
+
+    def test_SFC_batch_fractional_costs(self):
+        worker = TestWorker('SFC.nex', 0, 1, 1, 1, task=0)
+        data = DataInterface(worker.parasite_tree, worker.host_tree, worker.leaf_map)
+        answers = data.count_solutions_batch([(0, 1, 1, 1), (0, 0.5, 0.5, 0.5), (0, 1.5, 1.5, 1.5)], task=0)
+        self.assertEqual([count for _, count in answers], [184, 184, 184])
+
+    def test_COG2085_incremental(self):
+        worker = TestWorker('COG2085.nex', 0, 1, 1, 1, task=0)
+        data = DataInterface(worker.parasite_tree, worker.host_tree, worker.leaf_map)
+        recon = data.incremental_reconciliator((0, 1, 1, 1), task=0)
+        self.assertEqual(recon.root.num_subsolutions, 44544)
+
+        parasite = next(p for p in worker.parasite_tree if p.is_leaf())
+        original_host = worker.leaf_map[parasite]
+        new_host = next(h for h in worker.host_tree if h.is_leaf() and h != original_host)
+        root = recon.update_leaf_map(parasite.label, new_host.label)
+        self.assertIs(worker.leaf_map[parasite], original_host)
+        edited = DataInterface(recon.parasite_tree, worker.host_tree, recon.leaf_map)
+        expected_cost, expected_root = edited.count_solutions((0, 1, 1, 1), task=0)
+        self.assertEqual(root.cost // data.multiplier, expected_cost)
+        self.assertEqual(root.num_subsolutions, expected_root.num_subsolutions)
+
+        root = recon.update_leaf_map(parasite.label, original_host.label)
+        self.assertEqual(root.num_subsolutions, 44544)
+
+    def test_SFC_incremental_subtree(self):
+        worker = TestWorker('SFC.nex', 0, 1, 1, 1, task=0)
+        data = DataInterface(worker.parasite_tree, worker.host_tree, worker.leaf_map)
+        recon = data.incremental_reconciliator((0, 1, 1, 1), task=0)
+        size = worker.parasite_tree.size()
+        root = recon.replace_subtree('h002-002', '(X1,X2)', {'X1': 'h002', 'X2': 'h003'})
+        self.assertEqual((worker.parasite_tree.size(), recon.parasite_tree.size()), (size, size + 2))
+        self.assertEqual(data.count_solutions((0, 1, 1, 1), task=0)[1].num_subsolutions, 184)
+        edited = DataInterface(recon.parasite_tree, worker.host_tree, recon.leaf_map)
+        self.assertEqual(root.num_subsolutions, edited.count_solutions((0, 1, 1, 1), task=0)[1].num_subsolutions)
+        leaves = {str(node.association) for node in topological_order(root)
+                  if node.association is not None and node.association.parasite.is_leaf()}
+        self.assertIn('X1@h002', leaves)
+        self.assertNotIn('h002-002@h002', leaves)
+
+    def test_SFC_incremental_repeated_label(self):
+        worker = TestWorker('SFC.nex', 0, 1, 1, 1, task=0)
+        data = DataInterface(worker.parasite_tree, worker.host_tree, worker.leaf_map)
+        recon = data.incremental_reconciliator((0, 1, 1, 1), task=0)
+        size = recon.parasite_tree.size()
+        with self.assertRaises(ValueError):
+            recon.replace_subtree('h002-002', '(X,X)', {'X': 'h002'})
+        with self.assertRaises(ValueError):
+            recon.replace_subtree('h002-002', '(h002-001,X)', {'h002-001': 'h002', 'X': 'h003'})
+        self.assertEqual(recon.parasite_tree.size(), size)
+        root = recon.replace_subtree('h002-002', '(X1,X2)', {'X1': 'h002', 'X2': 'h003'})
+        edited = DataInterface(recon.parasite_tree, worker.host_tree, recon.leaf_map)
+        self.assertEqual(root.num_subsolutions, edited.count_optimal_solutions((0, 1, 1, 1))[1])
+
+    def test_SFC_incremental_associations(self):
+        worker = TestWorker('SFC.nex', 0, 1, 1, 1, task=0)
+        data = DataInterface(worker.parasite_tree, worker.host_tree, worker.leaf_map)
+        recon = data.incremental_reconciliator((0, 1, 1, 1), task=0)
+        root = recon.replace_subtree('h002-002', '(X1,X2)', {'X1': 'h002', 'X2': 'h003'})
+        for node in topological_order(root):
+            association = node.association
+            if association is not None:
+                fresh = Association(association.parasite, association.host)
+                self.assertEqual(association, fresh)
+                self.assertEqual(hash(association), hash(fresh))
+
+    def test_COG2085_0111_no_pruning(self):
+        worker = TestWorker('COG2085.nex', 0, 1, 1, 1, task=0)
+        worker.reconciliator.prune = False
+        self.assertEqual(worker.get_answer(), 44544)
+
+    def test_COG2085_0111_pruned_cells(self):
+        worker = TestWorker('COG2085.nex', 0, 1, 1, 1, task=0)
+        self.assertEqual(worker.get_answer(), 44544)
+        cost_matrices = worker.reconciliator.cost_matrices
+        used = sum(sum(row) for row in cost_matrices.main_used)
+        self.assertLess(used, worker.parasite_tree.size() * worker.host_tree.size() // 2)
+
+    def test_COG2085_0111_sparse_rows(self):
+        worker = TestWorker('COG2085.nex', 0, 1, 1, 1, task=0)
+        self.assertEqual(worker.get_answer(), 44544)
+        stored = sum(len(row.cells) for row in worker.reconciliator.main_matrix)
+        self.assertLess(stored, worker.parasite_tree.size() * worker.host_tree.size() // 2)
+        row = worker.reconciliator.main_matrix[worker.parasite_tree.root.index]
+        self.assertEqual(len(list(row)), worker.host_tree.size())
+
+    def test_count_only(self):
+        for input_file, cost_vector, threshold, expected in [('SFC.nex', (0, 1, 1, 0), float('Inf'), 6332),
+                                                             ('RH.nex', (-1, 1, 1, 1), float('Inf'), 1056),
+                                                             ('COG4965.nex', (0, 1, 1, 1), 6, 80)]:
+            worker = TestWorker(input_file, *cost_vector, task=0)
+            data = DataInterface(worker.parasite_tree, worker.host_tree, worker.leaf_map, threshold)
+            _, count = data.count_optimal_solutions(cost_vector)
+            self.assertEqual(count, expected)
+            _, root = data.count_solutions(cost_vector, task=0)
+            self.assertEqual(root.num_subsolutions, expected)
+
+    def test_count_only_approximate(self):
+        worker = TestWorker('SFC.nex', 0, 1, 1, 0, task=0)
+        data = DataInterface(worker.parasite_tree, worker.host_tree, worker.leaf_map)
+        _, count = data.count_optimal_solutions((0, 1, 1, 0), approximate=True)
+        self.assertIsInstance(count, float)
+        self.assertAlmostEqual(count, 6332)
+        with self.assertRaises(ValueError):
+            data.count_solutions((0, 1, 1, 0), task=0, approximate=True)
+        for processes in (1, 2):
+            answer = counter.run('datasets/SFC.nex', 1, (0, 1, 1, 0), processes=processes, approximate=True)
+            self.assertIsInstance(answer, float)
+            self.assertAlmostEqual(answer, 6332)
+
+    def test_SFC_0111_histogram(self):
+        worker = TestWorker('SFC.nex', 0, 1, 1, 1, task=0)
+        data = DataInterface(worker.parasite_tree, worker.host_tree, worker.leaf_map)
+        self.assertEqual(data.cost_histogram((0, 1, 1, 1), 0), {11: 184})
+        self.assertEqual(data.cost_histogram((0, 1, 1, 1), 2), {11: 184, 12: 5300, 13: 57195})
+        _, cost_summary, _ = data.enumerate_best_k((0, 1, 1, 1), 184 + 5300 + 1)
+        self.assertEqual(cost_summary, {11000: 184, 12000: 5300, 13000: 1})
+
+    def test_COG4965_0111_distance6_histogram(self):
+        worker = TestWorker('COG4965.nex', 0, 1, 1, 1, task=0)
+        data = DataInterface(worker.parasite_tree, worker.host_tree, worker.leaf_map, threshold=6)
+        self.assertEqual(data.cost_histogram((0, 1, 1, 1), 2), {103: 80, 104: 480, 105: 3356})
+
+    def test_SFC_0110_shared_nodes(self):
+        worker = TestWorker('SFC.nex', 0, 1, 1, 0, task=0)
+        generator = worker.reconciliator.solution_generator
+        self.assertEqual(worker.get_answer(), 6332)
+        num_requested, num_shared = generator.sharing_summary()
+        self.assertGreater(num_shared, 0)
+        self.assertLessEqual(num_shared, num_requested)
+        # every loss of cost 0 returns its child, every leaf association above its host is built once
+        self.assertEqual(len(generator.nodes), num_requested - num_shared)
+
+    def test_SFC_0111_shared_nodes(self):
+        worker = TestWorker('SFC.nex', 0, 1, 1, 1, task=0)
+        generator = worker.reconciliator.solution_generator
+        self.assertEqual(worker.get_answer(), 184)
+        num_requested, num_shared = generator.sharing_summary()
+        self.assertLessEqual(num_shared, num_requested)
+        # the losses of nonzero cost are never shared, only the leaf associations are counted
+        self.assertEqual(len(generator.nodes), num_requested - num_shared)
@@ -1,4 +1,8 @@
 import unittest
+from fractions import Fraction
+from capybara.eucalypt.solution import NestedSolution
+from capybara.equivalence.analyze_one_equivalence import VectorEnumerator
+from capybara.interface import DataInterface
 from capybara.test.test_worker import TestWorker
 
 
@@ -87,3 +91,43 @@ class CountEventVectorsTestCase(unittest.TestCase):
         worker = TestWorker('COG2085.nex', 0, 1, 1, 0, task=1)
         self.assertEqual(worker.get_answer(), 930)
 
+
+class EventVectorLossTestCase(unittest.TestCase):
+    def test_add_loss_shares_children(self):
+        worker = TestWorker('COG2085.nex', 0, 1, 1, 1, task=1)
+        worker.get_answer()
+        generator = worker.reconciliator.solution_generator
+        for row in worker.reconciliator.subtree_matrix:
+            for _, solution in row.items():
+                if solution.composition_type == NestedSolution.MULTIPLE and solution.cost < float('Inf'):
+                    lifted = generator.add_loss(1000, solution)
+                    self.assertIs(lifted.children, solution.children)
+                    self.assertEqual(lifted.num_losses, solution.num_losses + 1)
+                    self.assertEqual({tuple(vector.vector) for vector in lifted.event_vectors},
+                                     {tuple(vector.vector[:3] + [vector.vector[3] + 1])
+                                      for vector in solution.event_vectors})
+
+    def test_COG2085_0110_representatives(self):
+        worker = TestWorker('COG2085.nex', 0, 1, 1, 0, task=1, enum=True)
+        root = worker.reconciliator.run()
+        for vector in root.event_vectors:
+            enumerator = VectorEnumerator(vector, root)
+            enumerator.get_one_representative()
+            self.assertEqual(len(enumerator.current_mapping), worker.parasite_tree.size())
+
+
+class CostLandscapeTestCase(unittest.TestCase):
+    def test_RH_landscape(self):
+        worker = TestWorker('RH.nex', 0, 1, 1, 1, task=1)
+        data = DataInterface(worker.parasite_tree, worker.host_tree, worker.leaf_map)
+        regions = data.cost_landscape(0, 1, (Fraction(1, 2), 3), (Fraction(1, 2), 3))
+        self.assertEqual(sum(region.area() for region in regions), Fraction(25, 4))
+
+        # compare with a single run at the centroid of each region
+        for region in regions:
+            x = sum(vertex[0] for vertex in region.vertices) / len(region.vertices)
+            y = sum(vertex[1] for vertex in region.vertices) / len(region.vertices)
+            scale = x.denominator * y.denominator
+            opt_cost, root = data.count_solutions((0, int(x * scale), int(y * scale), scale), task=1)
+            self.assertEqual({tuple(vector.vector): vector.num_subsolutions for vector in root.event_vectors},
+                             {tuple(vector.vector): vector.num_subsolutions for vector in region.event_vectors})
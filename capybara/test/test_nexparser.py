@@ -0,0 +1,92 @@
+import io
+import unittest
+from capybara.eucalypt import nexparser
+from capybara.eucalypt.nexparser import NexusFileParserException, NexusParser
+
+
+HOST_BLOCK = '''#NEXUS
+BEGIN HOST;
+	TREE * Host = ((h0,h1),(h2,h3));
+ENDBLOCK;
+'''
+SYMBIONT_BLOCK = '''
+BEGIN PARASITE;
+	TREE * Parasite = {};
+ENDBLOCK;
+'''
+DISTRIBUTION_BLOCK = '''
+BEGIN DISTRIBUTION;
+	RANGE
+[a comment]
+		{}
+	;
+END;
+'''
+
+
+class NexusParserTestCase(unittest.TestCase):
+    @staticmethod
+    def problems(text):
+        return list(NexusParser(io.StringIO(text)).problems())
+
+    @staticmethod
+    def labels(leaf_map):
+        return {parasite.label: host.label for parasite, host in leaf_map.items()}
+
+    def test_datasets(self):
+        for input_file in ('SFC.nex', 'RH.nex', 'COG2085.nex'):
+            with open('datasets/' + input_file, 'r') as f:
+                parser = NexusParser(f)
+                parser.read()
+            self.assertTrue(parser.host_tree.is_full() and parser.parasite_tree.is_full())
+            self.assertEqual(set(parser.leaf_map), {parasite for parasite in parser.parasite_tree
+                                                   if parasite.is_leaf()})
+
+    def test_many_symbiont_trees(self):
+        text = HOST_BLOCK + SYMBIONT_BLOCK.format('(p0,p1)') + SYMBIONT_BLOCK.format('((p0,p1),p2)') + \
+            DISTRIBUTION_BLOCK.format('p0: h0, p1: h1') + DISTRIBUTION_BLOCK.format('p0: h2, p1: h3, p2: h0')
+        problems = self.problems(text)
+        self.assertEqual(len(problems), 2)
+        self.assertIs(problems[0][1], problems[1][1])
+        self.assertEqual(self.labels(problems[0][2]), {'p0': 'h0', 'p1': 'h1'})
+        self.assertEqual(self.labels(problems[1][2]), {'p0': 'h2', 'p1': 'h3', 'p2': 'h0'})
+
+    def test_many_distributions(self):
+        text = HOST_BLOCK + SYMBIONT_BLOCK.format('(p0,p1)') + \
+            ''.join(DISTRIBUTION_BLOCK.format(f'p0: h{i}, p1: h3') for i in range(3))
+        problems = self.problems(text)
+        self.assertEqual([self.labels(leaf_map)['p0'] for _, _, leaf_map in problems], ['h0', 'h1', 'h2'])
+        self.assertIs(problems[0][0], problems[2][0])
+
+    def test_read_first_problem(self):
+        text = HOST_BLOCK + SYMBIONT_BLOCK.format('(p0,p1)') + SYMBIONT_BLOCK.format('(p1,p0)') + \
+            DISTRIBUTION_BLOCK.format('p0: h0, p1: h1')
+        parser = NexusParser(io.StringIO(text))
+        parser.read()
+        self.assertEqual(repr(parser.parasite_tree), '(p0,p1)!P0')
+        self.assertEqual(self.labels(parser.leaf_map), {'p0': 'h0', 'p1': 'h1'})
+
+    def test_errors(self):
+        distribution = DISTRIBUTION_BLOCK.format('p0: h0, p1: h1')
+        with self.assertRaises(NexusFileParserException):
+            self.problems(HOST_BLOCK + distribution)
+        with self.assertRaises(NexusFileParserException):
+            self.problems(HOST_BLOCK + SYMBIONT_BLOCK.format('(p0,p1)') * 2 + distribution * 3)
+        with self.assertRaises(NexusFileParserException):
+            self.problems(HOST_BLOCK + SYMBIONT_BLOCK.format('(p0,p1))') + distribution)
+        with self.assertRaises(NexusFileParserException):
+            self.problems(HOST_BLOCK + SYMBIONT_BLOCK.format('(p0,p1)') + DISTRIBUTION_BLOCK.format('p0: h0'))
+
+    def test_newick(self):
+        tree = nexparser.tree_from_newick('((a, b)ab,(c,d))', '!H')
+        self.assertEqual(repr(tree), '((a,b)ab,(c,d)!H4)!H0')
+        self.assertEqual([node.key for node in tree], [2, 3, 1, 5, 6, 4, 0])
+        self.assertIsNone(nexparser.tree_from_newick('(a,b))', '!H'))
+        self.assertIsNone(nexparser.tree_from_newick('(a,b)(c,d)', '!H'))
+
+    def test_large_tree(self):
+        num_leaves = 100000
+        newick = '(' * (num_leaves - 1) + 'x0' + ''.join(f',x{i})' for i in range(1, num_leaves))
+        tree = nexparser.tree_from_newick(newick, '!H')
+        self.assertEqual(tree.size(), 2 * num_leaves - 1)
+        self.assertEqual(repr(tree).replace('!H', '')[:20], newick[:20])
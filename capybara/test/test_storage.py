@@ -0,0 +1,79 @@
+import io
+import unittest
+from capybara.eucalypt import nexparser, reconciliator
+from capybara.eucalypt.enumerator import SolutionsEnumerator
+from capybara.eucalypt.solution import NestedSolution
+from capybara.eucalypt.storage import read_solutions, write_solutions, SolutionFileException
+from capybara.equivalence import enumerate_classes as cla
+from capybara.interface import DataInterface
+
+
+class StorageTestCase(unittest.TestCase):
+    @staticmethod
+    def read_data(input_file):
+        with open('datasets/' + input_file, 'r') as f:
+            parser = nexparser.NexusParser(f)
+            parser.read()
+        return DataInterface(parser.parasite_tree, parser.host_tree, parser.leaf_map)
+
+    @staticmethod
+    def counter_root(data, cost_vector):
+        recon = reconciliator.ReconciliatorCounter(data.host_tree, data.parasite_tree, data.leaf_map,
+                                                   *(cost * data.multiplier for cost in cost_vector),
+                                                   float('Inf'), 0, True)
+        return recon.run()
+
+    @staticmethod
+    def reload(data, root):
+        file = io.BytesIO()
+        write_solutions(file, data.parasite_tree, data.host_tree, data.leaf_map, root)
+        file.seek(0)
+        parasite_tree, host_tree, leaf_map, loaded_root = read_solutions(file)
+        return DataInterface(parasite_tree, host_tree, leaf_map), loaded_root
+
+    @staticmethod
+    def enumerate(data, root):
+        writer = io.StringIO()
+        SolutionsEnumerator(data, root, writer, float('Inf'), False).run()
+        return writer.getvalue()
+
+    @staticmethod
+    def num_classes(data, root, task):
+        reachable = cla.fill_reachable_matrix(data.parasite_tree, data.host_tree, root)
+        return cla.fill_class_matrix(data.parasite_tree, data.host_tree, data.leaf_map, reachable,
+                                     task).num_subsolutions
+
+    def test_trees(self):
+        data = self.read_data('SFC.nex')
+        loaded_data, _ = self.reload(data, self.counter_root(data, (0, 1, 1, 1)))
+        self.assertEqual(repr(loaded_data.host_tree), repr(data.host_tree))
+        self.assertEqual(repr(loaded_data.parasite_tree), repr(data.parasite_tree))
+        self.assertEqual({(p.label, h.label) for p, h in loaded_data.leaf_map.items()},
+                         {(p.label, h.label) for p, h in data.leaf_map.items()})
+
+    def test_SFC_0111_count_and_classes(self):
+        data = self.read_data('SFC.nex')
+        root = self.counter_root(data, (0, 1, 1, 1))
+        loaded_data, loaded_root = self.reload(data, root)
+        self.assertEqual(loaded_root.cost, root.cost)
+        self.assertEqual(loaded_root.num_subsolutions, root.num_subsolutions)
+        self.assertEqual(self.num_classes(loaded_data, loaded_root, 2), self.num_classes(data, root, 2))
+        self.assertEqual(self.num_classes(loaded_data, loaded_root, 3), self.num_classes(data, root, 3))
+
+    def test_RH_m111_enumeration(self):
+        data = self.read_data('RH.nex')
+        _, root = data.enumerate_solutions_setup((-1, 1, 1, 1), 0, float('Inf'))
+        loaded_data, loaded_root = self.reload(data, root)
+        self.assertEqual(self.enumerate(loaded_data, loaded_root), self.enumerate(data, root))
+
+    def test_not_a_solution_file(self):
+        with self.assertRaises(SolutionFileException):
+            read_solutions(io.BytesIO(b'#NEXUS\n'))
+
+    def test_save_count_root(self):
+        data = self.read_data('SFC.nex')
+        _, root = data.count_solutions((0, 1, 1, 1), 0)
+        self.assertTrue(root.children)
+        summary = NestedSolution(root.cost, None, NestedSolution.MULTIPLE, None, False, [], root.num_subsolutions)
+        with self.assertRaises(ValueError):
+            data.save_solutions('summary.bin', summary)
@@ -0,0 +1,45 @@
+import io
+import unittest
+from capybara.eucalypt import nexparser
+from capybara.eucalypt.enumerator import SolutionsEnumerator
+from capybara.interface import DataInterface
+
+
+class SuboptimalTestCase(unittest.TestCase):
+    @staticmethod
+    def read_data(input_file, threshold=float('Inf')):
+        with open('datasets/' + input_file, 'r') as f:
+            parser = nexparser.NexusParser(f)
+            parser.read()
+        return DataInterface(parser.parasite_tree, parser.host_tree, parser.leaf_map, threshold)
+
+    @staticmethod
+    def enumerate(data, root):
+        writer = io.StringIO()
+        SolutionsEnumerator(data, root, writer, float('Inf'), False).run()
+        return [line for line in writer.getvalue().split('\n') if line and not line.startswith('[')]
+
+    def test_SFC_0111_delta0(self):
+        data = self.read_data('SFC.nex')
+        opt_cost, root = data.enumerate_suboptimal_setup((0, 1, 1, 1), 0)
+        self.assertEqual(opt_cost, 11)
+        solutions = self.enumerate(data, root)
+        self.assertEqual(len(solutions), 184)
+        self.assertEqual(len(set(solutions)), 184)
+
+    def test_SFC_0111_delta1(self):
+        data = self.read_data('SFC.nex')
+        opt_cost, root = data.enumerate_suboptimal_setup((0, 1, 1, 1), 1)
+        self.assertEqual(opt_cost, 11)
+        costs = [child.cost for child in root.children]
+        self.assertEqual(costs, sorted(costs))
+        solutions = self.enumerate(data, root)
+        self.assertEqual(len(set(solutions)), 5484)
+
+    def test_COG4965_0121_distance6(self):
+        data = self.read_data('COG4965.nex', 6)
+        cost_summary = data.cost_histogram((0, 1, 2, 1), 2)
+        _, root = data.enumerate_suboptimal_setup((0, 1, 2, 1), 2)
+        solutions = self.enumerate(data, root)
+        self.assertEqual(len(solutions), sum(cost_summary.values()))
+        self.assertEqual(len(set(solutions)), len(solutions))
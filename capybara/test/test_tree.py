@@ -0,0 +1,137 @@
+import io
+import unittest
+from capybara.equivalence import poly_enum_class as cenu
+from capybara.eucalypt import cyclicity, nexparser, util
+from capybara.eucalypt.enumerator import SolutionIterator, SolutionsEnumerator
+from capybara.eucalypt.transfer import ReceiverIndex
+from capybara.eucalypt.util import LCAIndex
+from capybara.interface import DataInterface
+
+
+class TreeTestCase(unittest.TestCase):
+    @staticmethod
+    def read_host_tree(input_file):
+        with open('datasets/' + input_file, 'r') as f:
+            parser = nexparser.NexusParser(f)
+            parser.read()
+        return parser.host_tree
+
+    def test_index_arrays(self):
+        tree = self.read_host_tree('COG2085.nex')
+        for node in tree:
+            self.assertIs(node.tree, tree)
+            self.assertEqual(tree.parent_index[node.index], -1 if node.is_root() else node.parent.index)
+            self.assertEqual(tree.sibling_index[node.index], -1 if node.is_root() else node.get_sibling().index)
+            self.assertEqual(tree.depth[node.index], len(node.get_proper_ancestors()))
+            if not node.is_leaf():
+                self.assertEqual(tree.left_index[node.index], node.left_child.index)
+                self.assertEqual(tree.right_index[node.index], node.right_child.index)
+
+    def test_ancestors_and_descendants(self):
+        tree = self.read_host_tree('COG2085.nex')
+        for node in tree:
+            ancestors = set(node.get_proper_ancestors()) | {node}
+            descendants = set(node.get_proper_descendants())
+            self.assertNotIn(node, descendants)
+            for other in tree:
+                self.assertEqual(other.is_ancestor_of(node), other in ancestors)
+                self.assertEqual(tree.is_ancestor(node.index, other.index), other in descendants or other is node)
+                self.assertEqual(other in descendants, node in other.get_proper_ancestors())
+
+    def test_receiver_index_shares_arrays(self):
+        tree = self.read_host_tree('SFC.nex')
+        index = ReceiverIndex(tree)
+        self.assertIs(index.start, tree.start)
+        self.assertIs(index.parent, tree.parent_index)
+
+    def test_lca_index(self):
+        tree = self.read_host_tree('COG2085.nex')
+        index = LCAIndex(tree)
+        for first in tree:
+            for second in tree:
+                self.assertIs(index.lca(first, second), util.find_lca(tree.root, first, second))
+
+    def test_transfer_edges(self):
+        with open('datasets/COG4965.nex', 'r') as f:
+            parser = nexparser.NexusParser(f)
+            parser.read()
+        data = DataInterface(parser.parasite_tree, parser.host_tree, parser.leaf_map)
+        _, root = data.enumerate_solutions_setup((0, 1, 1, 1), 0, 200)
+        enumerator = SolutionsEnumerator(data, root, io.StringIO(), 200, False)
+        enumerator.current_mapping, enumerator.current_text, enumerator.transfer_candidates = {}, [], []
+        iterator = SolutionIterator(root)
+        cell = root
+        while not iterator.done():
+            cell = enumerator.get_next(cell, iterator)
+        mapping, candidates = enumerator.current_mapping, enumerator.transfer_candidates
+        self.assertTrue(candidates)
+        self.assertEqual(cyclicity.find_transfer_edges(data.host_tree, mapping, candidates, data.get_lca_index()),
+                         cyclicity.find_transfer_edges(data.host_tree, mapping, candidates))
+
+
+class CaterpillarTestCase(unittest.TestCase):
+    """
+    Trees of 50k nodes, far deeper than the recursion limit
+    """
+    NUM_LEAVES = 25000
+
+    @staticmethod
+    def caterpillar(num_leaves, prefix):
+        return '(' * (num_leaves - 1) + prefix + '0' + ''.join(f',{prefix}{i})' for i in range(1, num_leaves))
+
+    def get_data(self, num_parasite_leaves, num_host_leaves):
+        host_tree = nexparser.tree_from_newick(self.caterpillar(num_host_leaves, 'h'), '!H')
+        parasite_tree = nexparser.tree_from_newick(self.caterpillar(num_parasite_leaves, 'p'), '!P')
+        host_leaves = [host for host in host_tree if host.is_leaf()]
+        parasite_leaves = [parasite for parasite in parasite_tree if parasite.is_leaf()]
+        leaf_map = {parasite: host_leaves[i % len(host_leaves)] for i, parasite in enumerate(parasite_leaves)}
+        return DataInterface(parasite_tree, host_tree, leaf_map)
+
+    @staticmethod
+    def one_solution(data, root):
+        enumerator = SolutionsEnumerator(data, root, io.StringIO(), 1, False)
+        enumerator.current_mapping, enumerator.current_text, enumerator.transfer_candidates = {}, [], []
+        iterator = SolutionIterator(root)
+        cell = root
+        while not iterator.done():
+            cell = enumerator.get_next(cell, iterator)
+        return enumerator.current_mapping
+
+    def test_tree_operations(self):
+        tree = nexparser.tree_from_newick(self.caterpillar(self.NUM_LEAVES, 'h'), '!H')
+        self.assertEqual(tree.size(), 2 * self.NUM_LEAVES - 1)
+        self.assertEqual(max(tree.depth), self.NUM_LEAVES - 1)
+        self.assertEqual(repr(nexparser.tree_from_newick(repr(tree), '!H')), repr(tree))
+        self.assertEqual(len(tree.root.get_proper_descendants()), tree.size() - 1)
+
+        deepest, top = tree.nodes[0], tree.root.right_child
+        index = LCAIndex(tree)
+        self.assertIs(util.find_lca(tree.root, deepest, deepest.get_sibling()), deepest.parent)
+        self.assertIs(index.lca(deepest, deepest.get_sibling()), deepest.parent)
+        self.assertIs(util.find_lca(tree.root, deepest, top), tree.root)
+        pairs = {deepest: [(top, 'edge')], top: [(deepest, 'edge')]}
+        self.assertEqual(util.tarjan_offline_lca_transfer_edges(tree, pairs), {'edge'})
+
+    def test_deep_symbiont_tree(self):
+        data = self.get_data(self.NUM_LEAVES, 3)
+        cost, root = data.count_solutions((0, 1, 1, 1), 0)
+        self.assertEqual((cost, root.num_subsolutions), (16666, 5))
+        _, root = data.count_solutions((0, 1, 1, 1), 3)
+        self.assertEqual(root.num_subsolutions, 3)
+        cost, _, root = data.enumerate_best_k((0, 1, 1, 1), 2)
+        self.assertEqual((cost, len(root.children)), (16666, 2))
+
+        _, root = data.enumerate_solutions_setup((0, 1, 1, 1), 0, 1)
+        self.assertEqual(len(self.one_solution(data, root)), data.parasite_tree.size())
+        _, root = data.enumerate_solutions_setup((0, 1, 1, 1), 3, 1)
+        mapping, _ = next(cenu.ClassEnumerator(data.parasite_tree, root, 3).run())
+        self.assertEqual(len(mapping), data.parasite_tree.size())
+
+    def test_deep_host_tree(self):
+        data = self.get_data(3, self.NUM_LEAVES)
+        cost, root = data.count_solutions((0, 1, 1, 1), 0)
+        self.assertEqual((cost, root.num_subsolutions), (0, 1))
+        _, root = data.enumerate_solutions_setup((0, 1, 1, 1), 0, 1)
+        mapping = self.one_solution(data, root)
+        self.assertEqual({parasite.label: host.label for parasite, host in mapping.items() if parasite.is_leaf()},
+                         {'p0': 'h0', 'p1': 'h1', 'p2': 'h2'})
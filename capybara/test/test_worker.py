@@ -4,7 +4,8 @@ from capybara.equivalence import enumerate_classes as cla, poly_enum_class as ce
 
 
 class TestWorker:
-    def __init__(self, input_file, cosp_cost, dup_cost, switch_cost, loss_cost, task, enum=False):
+    def __init__(self, input_file, cosp_cost, dup_cost, switch_cost, loss_cost, task, enum=False,
+                 threshold=float('Inf')):
         with open(os.path.join('datasets', input_file), 'r') as f:
             parser = nexparser.NexusParser(f)
             parser.read()
@@ -19,13 +20,13 @@ class TestWorker:
             self.reconciliator = reconciliator.ReconciliatorEnumerator(
                 self.host_tree, self.parasite_tree, self.leaf_map,
                 cost_vector[0] * self.multiplier, cost_vector[1] * self.multiplier,
-                cost_vector[2] * self.multiplier, cost_vector[3] * self.multiplier, float('Inf'),
+                cost_vector[2] * self.multiplier, cost_vector[3] * self.multiplier, threshold,
                 self.task, None)
         else:
             self.reconciliator = reconciliator.ReconciliatorCounter(
                              self.host_tree, self.parasite_tree, self.leaf_map,
                              cost_vector[0] * self.multiplier, cost_vector[1] * self.multiplier,
-                             cost_vector[2] * self.multiplier, cost_vector[3] * self.multiplier, float('Inf'),
+                             cost_vector[2] * self.multiplier, cost_vector[3] * self.multiplier, threshold,
                              self.task, True)
 
     def get_answer(self):
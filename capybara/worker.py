@@ -5,6 +5,7 @@ import logging
 import logging.handlers
 import uuid
 from capybara.eucalypt import nexparser, enumerator, cyclicity
+from capybara.eucalypt.util import format_count
 from capybara.interface import DataInterface
 from capybara.equivalence import poly_enum_class as cenu
 from capybara.equivalence import analyze_one_equivalence as inv
@@ -36,11 +37,13 @@ class Worker:
     """
     Worker class for using Capybara as a package
     """
-    def __init__(self, input_name, task, cost_vector, verbose):
+    def __init__(self, input_name, task, cost_vector, verbose, threshold=float('Inf'), processes=1):
         self.input_name = os.path.abspath(input_name)
         self.task = task
         self.data = None
         self.cost_vector = cost_vector
+        self.threshold = threshold
+        self.processes = processes
         self.log = logging.getLogger('capybara')
         self.id = uuid.uuid1().hex
         self.verbose_print = print if verbose else lambda x: None
@@ -58,8 +61,27 @@ class Worker:
         except (ValueError, OverflowError):
             self.log.error(f'{self.id} The cost vector is not valid.')
             return False
+        if self.threshold != float('Inf'):
+            try:
+                self.threshold = int(self.threshold)
+            except (ValueError, OverflowError):
+                self.log.error(f'{self.id} The distance threshold is not valid.')
+                return False
+            if self.threshold < 0:
+                self.log.error(f'{self.id} The distance threshold is not valid.')
+                return False
+        try:
+            self.processes = int(self.processes)
+        except (ValueError, TypeError):
+            self.log.error(f'{self.id} The number of processes is not valid.')
+            return False
+        if self.processes < 1:
+            self.log.error(f'{self.id} The number of processes is not valid.')
+            return False
         self.log.info(f'{self.id} Input file: {self.input_name}')
         self.log.info(f'{self.id} Cost vector: {self.cost_vector}')
+        if self.threshold != float('Inf'):
+            self.log.info(f'{self.id} Distance threshold: {self.threshold}')
         return True
 
     def read_data(self):
@@ -81,7 +103,7 @@ class Worker:
             self.log.error(f'{self.id} File not found.')
             return False
 
-        self.data = DataInterface(parasite_tree, host_tree, leaf_map)
+        self.data = DataInterface(parasite_tree, host_tree, leaf_map, self.threshold, self.processes)
         self.log.info(f'{self.id} Successful! Computing...')
         return True
 
@@ -101,8 +123,21 @@ class Counter(Worker):
     """
     Compute the number of solutions or classes
     """
-    def __init__(self, input_name, task, cost_vector, verbose):
-        super().__init__(input_name, task, cost_vector, verbose)
+    def __init__(self, input_name, task, cost_vector, verbose, threshold=float('Inf'), processes=1,
+                 approximate=False):
+        super().__init__(input_name, task, cost_vector, verbose, threshold, processes)
+        self.approximate = approximate
+
+    def check_options(self):
+        if not super().check_options():
+            return False
+        if self.approximate not in (True, False):
+            self.log.error(f'{self.id} Approximate should be either True or False.')
+            return False
+        if self.approximate and self.task == 1:
+            self.log.error(f'{self.id} The number of event vectors cannot be approximate.')
+            return False
+        return True
 
     def run(self):
         self.start()
@@ -110,13 +145,21 @@ class Counter(Worker):
         if not self.check_options() or not self.read_data():
             self.abort()
             return
-        opt_cost, root = self.data.count_solutions(self.cost_vector, self.task, cli=True)
-        if self.task == 1:
-            answer = len(root.event_vectors)
+        if self.task == 0 and (self.processes == 1 or self.approximate):
+            # only the number of solutions is needed, no solution is built
+            opt_cost, answer = self.data.count_optimal_solutions(self.cost_vector, self.approximate)
         else:
-            answer = root.num_subsolutions
-        self.log.info(f'{self.id} Done! The result of Counter Task {self.task+1} is {answer}')
-        self.verbose_print(f'{self.id} Job done! The answer is {answer}')
+            opt_cost, root = self.data.count_solutions(self.cost_vector, self.task, cli=True,
+                                                       approximate=self.approximate)
+            if self.data.sharing_summary is not None:
+                num_requested, num_shared = self.data.sharing_summary
+                self.log.info(f'{self.id} Shared solution nodes: {num_shared} out of {num_requested}')
+            if self.task == 1:
+                answer = len(root.event_vectors)
+            else:
+                answer = root.num_subsolutions
+        self.log.info(f'{self.id} Done! The result of Counter Task {self.task+1} is {format_count(answer)}')
+        self.verbose_print(f'{self.id} Job done! The answer is {format_count(answer)}')
         self.finish()
         return answer
 
@@ -126,11 +169,12 @@ class Enumerator(Worker, enumerator.SolutionsEnumerator):
     Enumerate solutions or classes to a file
     """
     def __init__(self, input_name, output_name, task, cost_vector, verbose,
-                 maximum, acyclic_only):
-        Worker.__init__(self, input_name, task, cost_vector, verbose)
+                 maximum, acyclic_only, threshold=float('Inf'), processes=1, delta=0):
+        Worker.__init__(self, input_name, task, cost_vector, verbose, threshold, processes)
         enumerator.SolutionsEnumerator.__init__(self, data=None, root=None,
                                                 writer=None, maximum=maximum, acyclic=acyclic_only)
         self.output_name = output_name
+        self.delta = delta  # enumerate the solutions of cost at most the optimal cost plus delta
         self.num_solutions = 0
         self.num_acyclic = 0
 
@@ -158,6 +202,15 @@ class Enumerator(Worker, enumerator.SolutionsEnumerator):
         if self.task == 0 and self.acyclic_only not in (True, False):
             self.log.error(f'{self.id} Acyclic should be either True or False.')
             return False
+        # check delta
+        try:
+            self.delta = int(self.delta)
+        except (ValueError, TypeError):
+            self.log.error(f'{self.id} The cost threshold is not valid.')
+            return False
+        if self.delta < 0 or (self.delta > 0 and self.task != 0):
+            self.log.error(f'{self.id} The cost threshold is not valid.')
+            return False
         return True
 
     def abort(self):
@@ -174,7 +227,12 @@ class Enumerator(Worker, enumerator.SolutionsEnumerator):
         if not self.check_options() or not self.read_data():
             self.abort()
             return
-        opt_cost, root = self.data.enumerate_solutions_setup(self.cost_vector, self.task, self.maximum, cli=True)
+        if self.delta > 0:
+            opt_cost, root = self.data.enumerate_suboptimal_setup(self.cost_vector, self.delta)
+        else:
+            opt_cost, root = self.data.enumerate_solutions_setup(self.cost_vector, self.task, self.maximum, cli=True)
+            num_requested, num_shared = self.data.sharing_summary
+            self.log.info(f'{self.id} Shared solution nodes: {num_shared} out of {num_requested}')
         try:
             self.write_header(opt_cost, self.task, self.cost_vector)
             self.root = root
@@ -205,6 +263,8 @@ class Enumerator(Worker, enumerator.SolutionsEnumerator):
         if task == 0:
             self.writer.write(f'#Task {task+1}: Enumerate {"acyclic " if self.acyclic_only else ""}solutions '
                               f'{"(cyclic or acyclic)" if not self.acyclic_only else ""}\n')
+            if self.delta > 0:
+                self.writer.write(f'#Cost threshold     = optimal cost + {self.delta}\n')
         elif task == 1:
             self.writer.write(f'#Task {task+1}: Enumerate event vectors\n')
         elif task == 2:
@@ -237,7 +297,8 @@ class Enumerator(Worker, enumerator.SolutionsEnumerator):
             is_acyclic = False
             if self.acyclic_only:
                 transfer_edges = cyclicity.find_transfer_edges(self.data.host_tree,
-                                                               self.current_mapping, self.transfer_candidates)
+                                                               self.current_mapping, self.transfer_candidates,
+                                                               self.data.get_lca_index())
                 if not transfer_edges:
                     is_acyclic = True
                 else:
@@ -316,8 +377,8 @@ class Generator(Worker):
     """
     Generate the equivalence classes one by one
     """
-    def __init__(self, input_name, task, cost_vector, verbose):
-        super().__init__(input_name, task, cost_vector, verbose)
+    def __init__(self, input_name, task, cost_vector, verbose, threshold=float('Inf'), processes=1):
+        super().__init__(input_name, task, cost_vector, verbose, threshold, processes)
 
     def check_options(self):
         # check input and cost vector